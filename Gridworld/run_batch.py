@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 将Gridworld目录添加到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# 批量求解多个地图（不绘图），例如：
+#   python Gridworld/run_batch.py Gridworld/data --out results --workers 4
+if __name__ == "__main__":
+    from src.batch import main
+    main()
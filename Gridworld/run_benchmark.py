@@ -0,0 +1,13 @@
+import os
+import sys
+
+# 将Gridworld目录添加到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# 在生成的地图上对各求解器做基准测试，例如：
+#   python Gridworld/run_benchmark.py --sizes 1e2 1e4 --save baseline.json
+#   python Gridworld/run_benchmark.py --sizes 1e2 1e4 --baseline baseline.json
+if __name__ == "__main__":
+    from src.benchmark import main
+    main()
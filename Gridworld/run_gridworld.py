@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 
@@ -8,6 +9,15 @@ sys.path.append(current_dir)
 
 # 直接运行main模块中的代码
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gridworld 策略评估、策略迭代与值迭代演示")
+    parser.add_argument("--no-plot", action="store_true", help="只求解，不绘图（不导入matplotlib）")
+    parser.add_argument("--save-png", metavar="DIR", help="用Agg后端把图保存为DIR下的PNG文件，而不是弹出窗口")
+    args = parser.parse_args()
+    plot = not args.no_plot
+    if args.save_png:
+        os.makedirs(args.save_png, exist_ok=True)
+
+    # src.main 只在绘图时才导入matplotlib
     from src.main import run_policy_evaluation, run_policy_iteration, run_value_iteration
     from src.map_parser import MapParser
     from src.policy_parser import PolicyParser
@@ -23,14 +33,14 @@ if __name__ == "__main__":
     initial_policy = policy_parser.parse_policy("Gridworld/data/map01.policy")
 
     # 运行策略评估
-    run_policy_evaluation(grid_world, initial_policy)
+    run_policy_evaluation(grid_world, initial_policy, plot, args.save_png)
 
     # 运行策略迭代
     # 重新加载策略以获得干净的起点
     initial_policy_for_pi = policy_parser.parse_policy("Gridworld/data/map01.policy")
-    run_policy_iteration(grid_world, initial_policy_for_pi)
+    run_policy_iteration(grid_world, initial_policy_for_pi, plot, args.save_png)
 
     # 运行值迭代
-    run_value_iteration(grid_world)
+    run_value_iteration(grid_world, plot, args.save_png)
 
     print("\n所有算法演示完成。")
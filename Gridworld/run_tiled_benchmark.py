@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 将Gridworld目录添加到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# 分块多线程值迭代的扩展性测试（1到N个线程），例如：
+#   python Gridworld/run_tiled_benchmark.py big.grid --workers 1 2 4 8 16 32
+if __name__ == "__main__":
+    from src.tiled import main
+    main()
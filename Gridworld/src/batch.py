@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from src.map_parser import MapParser
+from src.policy_parser import PolicyParser
+from src.gridworld import GridWorld
+from src.policy import Policy
+from src.instrumentation import JsonLinesTrace, with_fields
+
+ALGORITHMS = ('value_iteration', 'policy_iteration', 'policy_evaluation')
+
+# Characters written to result .policy files, by action code; -1 ('NONE') is the last entry
+POLICY_CHARS = np.frombuffer(b'NESW.', dtype=np.uint8)
+
+
+def collect_maps(patterns):
+    """.grid files named by the patterns: files, directories (all .grid files inside) or globs."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(glob.glob(os.path.join(pattern, '*.grid')))
+        else:
+            paths.extend(glob.glob(pattern))
+    return sorted(set(paths))
+
+
+def policy_path_for(map_path):
+    """The .policy file next to a .grid file, or None."""
+    path = os.path.splitext(map_path)[0] + '.policy'
+    return path if os.path.exists(path) else None
+
+
+def _trace_path(out_dir, map_path):
+    stem = os.path.splitext(os.path.basename(map_path))[0]
+    return os.path.join(out_dir, f"{stem}.trace.jsonl")
+
+
+def _solve_map(map_path, algorithm, gamma, theta, engine, solver, trace_dir=None):
+    """
+    Worker: solves one map and leaves values, action codes and the map's
+    cell types in a new shared-memory block, so only its name crosses the
+    process boundary.
+    With a trace_dir the solver's convergence records go to
+    <trace_dir>/<map>.trace.jsonl.
+    """
+    start = time.perf_counter()
+    # Solvers print progress, batch runs stay quiet
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.ExitStack() as stack:
+        callback = None
+        if trace_dir is not None:
+            trace = stack.enter_context(JsonLinesTrace(_trace_path(trace_dir, map_path)))
+            callback = with_fields(trace, map=map_path)
+        grid_world = GridWorld(MapParser().parse_map(map_path))
+        if algorithm == 'value_iteration':
+            policy = Policy.value_iteration(grid_world, gamma, theta, engine=engine, callback=callback)
+        else:
+            policy_path = policy_path_for(map_path)
+            if policy_path is None:
+                raise FileNotFoundError(f"No .policy file next to {map_path}.")
+            policy = PolicyParser().parse_policy(policy_path)
+            if algorithm == 'policy_iteration':
+                policy = Policy.policy_iteration(policy, grid_world, gamma, theta, engine=engine, solver=solver,
+                                                 callback=callback)
+            else:
+                policy.evaluate_policy(grid_world, gamma, theta, engine=engine, solver=solver, callback=callback)
+    solve_time = time.perf_counter() - start
+
+    n_states = len(policy.values)
+    block = shared_memory.SharedMemory(create=True, size=max(n_states * 10, 1))
+    values = np.ndarray((n_states,), dtype=np.float64, buffer=block.buf)
+    actions = np.ndarray((n_states,), dtype=np.int8, buffer=block.buf, offset=n_states * 8)
+    cell_types = np.ndarray((n_states,), dtype=np.uint8, buffer=block.buf, offset=n_states * 9)
+    values[:] = policy.values
+    actions[:] = policy.policy
+    cell_types[:] = grid_world.grid_map.cell_types.ravel()
+    del values, actions, cell_types
+    block.close()
+
+    stats = policy.sweep_stats
+    return {
+        'map': map_path,
+        'shared_memory': block.name,
+        'height': grid_world.get_height(),
+        'width': grid_world.get_width(),
+        'sweeps': stats.sweeps if stats is not None else None,
+        'converged': stats.converged if stats is not None else None,
+        'solve_time': solve_time,
+    }
+
+
+def _write_result(result, out_dir):
+    """Copies a worker's shared-memory result to <out_dir>/<map>.values.npy and <map>.policy."""
+    height, width = result['height'], result['width']
+    n_states = height * width
+    block = shared_memory.SharedMemory(name=result['shared_memory'])
+    try:
+        values = np.ndarray((height, width), dtype=np.float64, buffer=block.buf)
+        actions = np.ndarray((height, width), dtype=np.int8, buffer=block.buf, offset=n_states * 8)
+        cell_types = np.ndarray((height, width), dtype=np.uint8, buffer=block.buf, offset=n_states * 9)
+        stem = os.path.splitext(os.path.basename(result['map']))[0]
+        np.save(os.path.join(out_dir, f"{stem}.values.npy"), values)
+
+        # Result policies use the .policy format; walls and goals keep their map characters
+        chars = np.where(actions >= 0, POLICY_CHARS[actions], cell_types)
+        with open(os.path.join(out_dir, f"{stem}.policy"), 'wb') as f:
+            f.write(b'\n'.join(row.tobytes() for row in chars) + b'\n')
+        del values, actions, cell_types
+    finally:
+        block.close()
+        block.unlink()
+
+
+def solve_batch(map_paths, out_dir, algorithm='value_iteration', gamma=1, theta=0.01, engine='jacobi',
+                solver=None, workers=None, trace=False):
+    """
+    Solves every map on a process pool and writes the results to out_dir.
+    Returns the per-map results (map, size, sweeps, solve time, or error) and
+    prints per-map timings and the overall throughput. With trace, each map's
+    convergence records are written to out_dir as JSON lines.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {ALGORITHMS}.")
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Workers must share this process's resource tracker: blocks they create are
+    # unlinked here, a tracker of their own would remove them again on exit
+    resource_tracker.ensure_running()
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_solve_map, path, algorithm, gamma, theta, engine, solver,
+                               out_dir if trace else None): path
+                   for path in map_paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                _write_result(result, out_dir)
+                del result['shared_memory']
+                print(f"{result['map']}: {result['height']}x{result['width']}, "
+                      f"{result['sweeps']} sweeps, {result['solve_time']:.3f}s"
+                      f"{'' if result['converged'] is not False else ' (not converged)'}")
+            except Exception as e:
+                result = {'map': futures[future], 'error': str(e)}
+                print(f"{result['map']}: failed ({e})")
+            results.append(result)
+
+    elapsed = time.perf_counter() - start
+    solved = sum('error' not in result for result in results)
+    print(f"Solved {solved}/{len(results)} maps in {elapsed:.2f}s "
+          f"({solved / elapsed if elapsed > 0 else 0:.2f} maps/s).")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch solver for Gridworld maps.")
+    parser.add_argument('maps', nargs='+', help=".grid files, directories or glob patterns")
+    parser.add_argument('--out', default='results', help="output directory for values and policies")
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='value_iteration')
+    parser.add_argument('--gamma', type=float, default=1)
+    parser.add_argument('--theta', type=float, default=0.01)
+    parser.add_argument('--engine', default='jacobi', help="sweep engine, see src.sweeps")
+    parser.add_argument('--solver', default=None, help="linear solver for policy evaluation, see src.linear_evaluation")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--trace', action='store_true',
+                        help="write per-sweep convergence records to <out>/<map>.trace.jsonl")
+    args = parser.parse_args(argv)
+
+    map_paths = collect_maps(args.maps)
+    if not map_paths:
+        parser.error("no .grid files found")
+    solve_batch(map_paths, args.out, args.algorithm, args.gamma, args.theta, args.engine, args.solver, args.workers,
+                args.trace)
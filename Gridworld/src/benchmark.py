@@ -0,0 +1,239 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.gridworld import GridWorld
+from src.map_generator import MAP_KINDS, generate_map, random_policy
+from src.policy import Policy
+from src.shortest_path import is_unit_cost, shortest_path_values
+from src.sweeps import make_backup, run_sweeps
+from src.linear_evaluation import evaluate_linear
+
+# Solver variants: (name, algorithm, keyword arguments, largest map in cells or None, gamma or None for the
+# benchmark's); the shortest-path backend only applies to unit-cost worlds, which need gamma = 1
+VARIANTS = [
+    ('vi-jacobi', 'value_iteration', {'engine': 'jacobi', 'shortest_path': False}, None, None),
+    ('vi-gauss_seidel', 'value_iteration', {'engine': 'gauss_seidel'}, None, None),
+    ('vi-bfs', 'value_iteration', {'engine': 'bfs'}, None, None),
+    ('vi-prioritized', 'value_iteration', {'engine': 'prioritized'}, 10 ** 4, None),
+    ('vi-shortest_path', 'value_iteration', {'engine': 'jacobi', 'shortest_path': True}, None, 1),
+    ('vi-multigrid', 'value_iteration', {'engine': 'gauss_seidel', 'multigrid': True}, None, None),
+    ('vi-tiled', 'value_iteration', {'workers': os.cpu_count() or 1}, None, None),
+    ('pi-jacobi', 'policy_iteration', {'engine': 'jacobi'}, 10 ** 6, None),
+    ('pi-spsolve', 'policy_iteration', {'solver': 'spsolve'}, 10 ** 6, None),
+    ('pe-jacobi', 'evaluate_policy', {'engine': 'jacobi'}, None, None),
+    ('pe-gauss_seidel', 'evaluate_policy', {'engine': 'gauss_seidel'}, None, None),
+    ('pe-spsolve', 'evaluate_policy', {'solver': 'spsolve'}, 10 ** 6, None),
+    ('pe-gmres', 'evaluate_policy', {'solver': 'gmres'}, 10 ** 6, None),
+    ('pe-neumann', 'evaluate_policy', {'solver': 'neumann'}, 10 ** 6, None),
+]
+VARIANT_NAMES = [name for name, _, _, _, _ in VARIANTS]
+
+DEFAULT_SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5)
+# Reference values are solved to this tolerance, and only up to this many cells
+REFERENCE_THETA = 1e-10
+REFERENCE_MAX_SWEEPS = 100000
+REFERENCE_MAX_CELLS = 10 ** 6
+
+# Regression gate: slower than TIME_TOLERANCE x baseline (ignoring runs under MIN_GATED_SECONDS),
+# more sweeps, lost convergence or a value error grown by more than ERROR_TOLERANCE
+TIME_TOLERANCE = 1.5
+MIN_GATED_SECONDS = 0.05
+ERROR_TOLERANCE = 1e-6
+
+
+def reference_values(grid_world, algorithm, policy, gamma):
+    """
+    Values the solvers are checked against: optimal values (exact shortest
+    paths for unit-cost worlds, tight Gauss-Seidel otherwise), or for
+    evaluate_policy the policy's values by a direct solve. None if the values
+    are unbounded (gamma = 1 and some state never reaches a goal).
+    """
+    table = grid_world.get_transition_table()
+    if algorithm == 'evaluate_policy':
+        result = evaluate_linear(grid_world, policy, gamma, 'spsolve')
+        return None if result is None else result[0]
+    if is_unit_cost(grid_world, gamma):
+        V, stats = shortest_path_values(grid_world, theta=0.5, max_iterations=table.n_states)
+        return V if stats.converged else None
+    V = np.zeros(table.n_states)
+    stats = run_sweeps('gauss_seidel', make_backup(grid_world, gamma), V, REFERENCE_THETA, REFERENCE_MAX_SWEEPS,
+                       roots=np.flatnonzero(table.goals))
+    return V if stats.converged else None
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process. VmHWM starts afresh in a new
+    process, unlike ru_maxrss, which a spawned child inherits from its parent.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_case(kind, cells, seed, variant, gamma, theta, max_iterations):
+    """
+    Worker, one fresh process per case so the peak RSS is that of this solve
+    (plus the interpreter and the map). Returns the record and values.
+    """
+    name, algorithm, options, _, _ = next(v for v in VARIANTS if v[0] == variant)
+    grid_map = generate_map(kind, cells, seed)
+    grid_world = GridWorld(grid_map)
+    grid_world.get_transition_table()  # compiled before timing
+    policy = Policy(random_policy(grid_map, seed), grid_map.get_width(), grid_map.get_height())
+    # The linear solvers import SciPy lazily; a fresh process would otherwise time the import
+    import scipy.sparse  # noqa: F401
+    import scipy.sparse.linalg  # noqa: F401
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if algorithm == 'value_iteration':
+            policy = Policy.value_iteration(grid_world, gamma, theta, max_iterations=max_iterations, **options)
+        elif algorithm == 'policy_iteration':
+            policy = Policy.policy_iteration(policy, grid_world, gamma, theta, max_iterations=max_iterations,
+                                             **options)
+        else:
+            policy.evaluate_policy(grid_world, gamma, theta, max_iterations=max_iterations, **options)
+        seconds = time.perf_counter() - start
+
+    stats = policy.sweep_stats
+    if algorithm == 'policy_iteration':
+        sweeps = sum(iteration.sweeps for iteration in policy.iteration_stats)
+    else:
+        sweeps = stats.sweeps
+    record = {
+        'map': kind,
+        'cells': grid_map.get_width() * grid_map.get_height(),
+        'variant': name,
+        'algorithm': algorithm,
+        'gamma': gamma,
+        'seconds': seconds,
+        'sweeps': sweeps,
+        'converged': bool(stats.converged),
+        'peak_rss_mb': peak_rss_mb(),
+        'value_error': None,
+    }
+    return record, policy.values
+
+
+def run_benchmark(kinds=MAP_KINDS, sizes=DEFAULT_SIZES, variants=VARIANT_NAMES, gamma=0.95, theta=0.01,
+                  max_iterations=500, seed=0):
+    """
+    Runs every variant on every generated map, each in a fresh process and
+    at gamma unless the variant fixes its own (see VARIANTS), and returns
+    one record per case: time, sweeps, convergence, peak RSS and the max
+    value error over the free cells against reference_values (None for
+    maps above REFERENCE_MAX_CELLS).
+    """
+    records = []
+    context = multiprocessing.get_context('spawn')
+    for kind in kinds:
+        for cells in sizes:
+            grid_map = generate_map(kind, cells, seed)
+            grid_world = GridWorld(grid_map)
+            active = grid_world.get_transition_table().active
+            policy = random_policy(grid_map, seed)
+            references = {}
+            for variant in variants:
+                name, algorithm, _, max_cells, variant_gamma = next(v for v in VARIANTS if v[0] == variant)
+                if max_cells is not None and cells > max_cells:
+                    continue
+                if variant_gamma is None:
+                    variant_gamma = gamma
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    record, values = pool.submit(_run_case, kind, cells, seed, variant, variant_gamma, theta,
+                                                 max_iterations).result()
+
+                if record['cells'] <= REFERENCE_MAX_CELLS:
+                    key = ('evaluate_policy' if algorithm == 'evaluate_policy' else 'optimal', variant_gamma)
+                    if key not in references:
+                        references[key] = reference_values(grid_world, algorithm, policy, variant_gamma)
+                    if references[key] is not None:
+                        record['value_error'] = float(np.max(np.abs(values - references[key])[active], initial=0))
+                records.append(record)
+                print(format_record(record))
+    return records
+
+
+def format_record(record):
+    error = record['value_error']
+    return (f"{record['map']:<10} {record['cells']:>9} {record['variant']:<17} {record.get('gamma', '-'):>5} "
+            f"{record['seconds']:>9.3f}s "
+            f"{record['sweeps']:>7} {'yes' if record['converged'] else 'NO':>4} {record['peak_rss_mb']:>8.1f}MB "
+            f"{'-' if error is None else f'{error:.2e}':>9}")
+
+
+def table_header():
+    return (f"{'map':<10} {'cells':>9} {'variant':<17} {'gamma':>5} {'time':>10} {'sweeps':>7} {'conv':>4} {'peak RSS':>10} "
+            f"{'error':>9}")
+
+
+def compare(records, baseline, time_tolerance=TIME_TOLERANCE):
+    """Descriptions of the cases that regressed against the baseline records (same map, size and variant)."""
+    previous = {(r['map'], r['cells'], r['variant']): r for r in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get((record['map'], record['cells'], record['variant']))
+        if old is None:
+            continue
+        case = f"{record['map']} {record['cells']} {record['variant']}"
+        if record['seconds'] > max(old['seconds'] * time_tolerance, MIN_GATED_SECONDS):
+            regressions.append(f"{case}: {record['seconds']:.3f}s, baseline {old['seconds']:.3f}s")
+        if record['sweeps'] > old['sweeps']:
+            regressions.append(f"{case}: {record['sweeps']} sweeps, baseline {old['sweeps']}")
+        if old['converged'] and not record['converged']:
+            regressions.append(f"{case}: no longer converges")
+        if (record['value_error'] is not None and old['value_error'] is not None
+                and record['value_error'] > old['value_error'] + ERROR_TOLERANCE):
+            regressions.append(f"{case}: value error {record['value_error']:.2e}, "
+                               f"baseline {old['value_error']:.2e}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the Gridworld solvers on generated maps.")
+    parser.add_argument('--maps', nargs='+', choices=MAP_KINDS, default=list(MAP_KINDS))
+    parser.add_argument('--sizes', nargs='+', type=float, default=list(DEFAULT_SIZES),
+                        help="map sizes in cells, e.g. 1e2 1e4 1e7")
+    parser.add_argument('--variants', nargs='+', choices=VARIANT_NAMES, default=VARIANT_NAMES)
+    parser.add_argument('--gamma', type=float, default=0.95)
+    parser.add_argument('--theta', type=float, default=0.01)
+    parser.add_argument('--max-iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='FILE', help="write the results as a JSON baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="fail if any case regressed against this JSON baseline")
+    parser.add_argument('--time-tolerance', type=float, default=TIME_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    print(table_header())
+    records = run_benchmark(args.maps, [int(size) for size in args.sizes], args.variants, args.gamma, args.theta,
+                            args.max_iterations, args.seed)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+                       'cpus': os.cpu_count(), 'gamma': args.gamma, 'theta': args.theta,
+                       'records': records}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(records, json.load(f)['records'], args.time_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against the baseline.")
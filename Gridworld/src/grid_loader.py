@@ -0,0 +1,132 @@
+import mmap
+import numpy as np
+
+# Bytes removed from both ends of a row, like str.strip() on ASCII text
+WHITESPACE = np.array([ord(c) for c in ' \t\n\r\x0b\x0c'], dtype=np.uint8)
+
+DEFAULT_CHUNK_SIZE = 1 << 22  # 4 MB of file per decoding step
+
+
+def _resolve_window(window, name):
+    if window is None:
+        return 0, None
+    if isinstance(window, tuple):
+        window = slice(*window)
+    if window.step not in (None, 1):
+        raise ValueError(f"{name} window must be contiguous.")
+    start, stop = window.start or 0, window.stop
+    if start < 0 or (stop is not None and stop < start):
+        raise ValueError(f"{name} window must be a non-negative (start, stop) range.")
+    return start, stop
+
+
+def _decode_rows(chunk):
+    """Start offset and stripped width of every non-blank line in a chunk of bytes."""
+    breaks = np.flatnonzero(chunk == ord('\n'))
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(chunk)]))
+
+    content = np.flatnonzero(~np.isin(chunk, WHITESPACE))
+    first = np.searchsorted(content, starts)
+    last = np.searchsorted(content, ends) - 1
+    non_blank = first <= last
+
+    first_offsets = content[first[non_blank]]
+    widths = content[last[non_blank]] - first_offsets + 1
+    return first_offsets, widths
+
+
+def iter_chunks(buffer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (start, stop) byte ranges of the buffer that end on a line break."""
+    size = len(buffer)
+    start = 0
+    while start < size:
+        stop = start + chunk_size
+        if stop >= size:
+            stop = size
+        else:
+            cut = buffer.rfind(b'\n', start, stop)
+            if cut < 0:
+                # A single line is longer than the chunk, read up to its end
+                cut = buffer.find(b'\n', stop)
+                if cut < 0:
+                    cut = size - 1
+            stop = cut + 1
+        yield start, stop
+        start = stop
+
+
+def _read_rows(buffer, row_start, row_stop, col_start, col_stop, kind, chunk_size):
+    """Decodes the window of a mapped file; returns (blocks of rows, width, rows seen)."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    try:
+        width = None
+        row_count = 0
+        blocks = []
+        for start, stop in iter_chunks(buffer, chunk_size):
+            chunk = data[start:stop]
+            first_offsets, widths = _decode_rows(chunk)
+            if len(widths) == 0:
+                continue
+
+            if width is None:
+                width = int(widths[0])
+                col_stop = width if col_stop is None else min(col_stop, width)
+            bad_rows = np.flatnonzero(widths != width)
+            if len(bad_rows):
+                raise ValueError(f"{kind} rows must have consistent width "
+                                 f"(row {row_count + bad_rows[0]} has {widths[bad_rows[0]]}, expected {width}).")
+
+            # Rows of this chunk that fall inside the window
+            lo = max(row_start - row_count, 0)
+            hi = len(widths) if row_stop is None else min(row_stop - row_count, len(widths))
+            if lo < hi and col_start < col_stop:
+                offsets = first_offsets[lo:hi, np.newaxis] + np.arange(col_start, col_stop)
+                blocks.append(chunk[offsets])
+            row_count += len(widths)
+            if row_stop is not None and row_count >= row_stop:
+                break
+    finally:
+        # Drop every view of the mapping so it can be closed, also when raising
+        data = chunk = None
+    return blocks, width, row_count
+
+
+def load_grid(file_path, rows=None, cols=None, kind="Map", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Loads a .grid or .policy text file into a (height, width) uint8 array of characters.
+
+    The file is memory-mapped and decoded chunk by chunk straight into the
+    array; blank lines are skipped and rows are stripped like the original
+    parsers did. rows and cols select a rectangular sub-window as slices or
+    (start, stop) tuples; rows after the window are never read.
+    """
+    row_start, row_stop = _resolve_window(rows, "Row")
+    col_start, col_stop = _resolve_window(cols, "Column")
+
+    with open(file_path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f"{kind} file is empty.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            blocks, width, row_count = _read_rows(buffer, row_start, row_stop, col_start, col_stop,
+                                                  kind, chunk_size)
+
+    if width is None:
+        raise ValueError(f"{kind} file is empty.")
+    if not blocks:
+        raise ValueError(f"{kind} window is outside the {kind.lower()} ({row_count}x{width}).")
+    return np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+
+
+def load_grid_text(text, kind="Map"):
+    """Decodes grid text held in a string (e.g. a map written in code) like load_grid decodes a file."""
+    chunk = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    first_offsets, widths = _decode_rows(chunk)
+    if len(widths) == 0:
+        raise ValueError(f"{kind} is empty.")
+    width = int(widths[0])
+    bad_rows = np.flatnonzero(widths != width)
+    if len(bad_rows):
+        raise ValueError(f"{kind} rows must have consistent width "
+                         f"(row {bad_rows[0]} has {widths[bad_rows[0]]}, expected {width}).")
+    return chunk[first_offsets[:, np.newaxis] + np.arange(width)]
@@ -1,8 +1,138 @@
-from src.map_parser import Map  # 修改为绝对导入
+import numpy as np
+from src.map_parser import Map, Cell  # 修改为绝对导入
+from src.transition_table import ACTIONS, ACTION_DELTAS, Action, TransitionTable, action_code
+
+SLIP_MODELS = ('perpendicular', 'uniform', 'stay')
+
+def slip_outcomes(slip=0.0, slip_model='perpendicular'):
+    """
+    Outcome probabilities per chosen action, shape (n_actions + 1, n_actions + 1).
+    Columns are the four moves followed by staying put; the last row is the
+    'NONE' action, which always stays. With probability slip the intended move
+    is replaced according to slip_model:
+      'perpendicular' - one of the two perpendicular moves
+      'uniform'       - a uniformly random move (noise, may be the intended one)
+      'stay'          - no move at all
+    slip_model can also be an (n_actions, n_actions + 1) array of outcome
+    probabilities, in which case slip is ignored.
+    """
+    n_actions = len(ACTIONS)
+    outcomes = np.zeros((n_actions + 1, n_actions + 1))
+    outcomes[n_actions, n_actions] = 1.0
+
+    if not isinstance(slip_model, str):
+        custom = np.asarray(slip_model, dtype=float)
+        if custom.shape != (n_actions, n_actions + 1) or not np.allclose(custom.sum(axis=1), 1):
+            raise ValueError(f"Slip model must be a ({n_actions}, {n_actions + 1}) array of probability rows.")
+        outcomes[:n_actions] = custom
+        return outcomes
+    if slip_model not in SLIP_MODELS:
+        raise ValueError(f"Unknown slip model '{slip_model}', expected one of {SLIP_MODELS}.")
+    if not 0 <= slip <= 1:
+        raise ValueError("Slip probability must be between 0 and 1.")
+
+    for a in range(n_actions):
+        outcomes[a, a] = 1 - slip
+        if slip_model == 'perpendicular':
+            outcomes[a, (a + 1) % n_actions] += slip / 2
+            outcomes[a, (a - 1) % n_actions] += slip / 2
+        elif slip_model == 'uniform':
+            outcomes[a, :n_actions] += slip / n_actions
+        else:
+            outcomes[a, n_actions] += slip
+    return outcomes
 
 class GridWorld:
-    def __init__(self, grid_map):
+    def __init__(self, grid_map, slip=0.0, slip_model='perpendicular'):
         self.grid_map = grid_map
+        self.slip = slip
+        self.slip_model = slip_model
+        self.outcomes = slip_outcomes(slip, slip_model)
+        self._transition_table = None
+        self._transition_matrices = None
+        self._expected_rewards = None
+
+    def get_transition_table(self):
+        """Compiled (n_states, n_actions) transition model, built on first use and kept per GridWorld."""
+        if self._transition_table is None:
+            self._transition_table = TransitionTable.from_map(self.grid_map)
+        return self._transition_table
+
+    def is_stochastic(self):
+        n_actions = len(ACTIONS)
+        return not np.array_equal(self.outcomes[:n_actions, :n_actions], np.eye(n_actions))
+
+    def build_transition_matrix(self, actions):
+        """
+        Sparse CSR matrix P(s, s') when taking actions[s] in every state
+        (an action index, or -1 for 'NONE'). Holds at most five non-zeros per row.
+        """
+        import scipy.sparse
+
+        table = self.get_transition_table()
+        n_states = table.n_states
+        # Outcome targets: the deterministic move of each action, then staying put
+        targets = np.column_stack((table.next_states, np.arange(n_states)))
+        weights = self.outcomes[actions]
+        rows = np.repeat(np.arange(n_states), targets.shape[1])
+        keep = weights.ravel() > 0
+        # Duplicate (row, target) pairs, e.g. a blocked move and staying put, are summed
+        return scipy.sparse.csr_matrix((weights.ravel()[keep], (rows[keep], targets.ravel()[keep])),
+                                       shape=(n_states, n_states))
+
+    def get_transition_matrices(self):
+        """One sparse transition matrix per action in ACTIONS order, built once per GridWorld."""
+        if self._transition_matrices is None:
+            n_states = self.get_transition_table().n_states
+            self._transition_matrices = [self.build_transition_matrix(np.full(n_states, a))
+                                         for a in range(len(ACTIONS))]
+        return self._transition_matrices
+
+    def get_state_rewards(self):
+        """R(s, s') by target state s': 1 for entering a goal, -1 otherwise (see get_reward)."""
+        return np.where(self.get_transition_table().goals, 1.0, -1.0)
+
+    def get_expected_rewards(self):
+        """Expected reward sum_s' P_a(s, s') R(s, s') per state and action."""
+        if self._expected_rewards is None:
+            if self.is_stochastic():
+                state_rewards = self.get_state_rewards()
+                self._expected_rewards = np.column_stack([matrix @ state_rewards
+                                                          for matrix in self.get_transition_matrices()])
+            else:
+                self._expected_rewards = self.get_transition_table().rewards
+        return self._expected_rewards
+
+    def get_q_values(self, V, gamma):
+        """Q(s, a) for every state and action, shape (n_states, n_actions)."""
+        if not self.is_stochastic():
+            return self.get_transition_table().q_values(V, gamma)
+        rewards = self.get_expected_rewards()
+        return np.column_stack([rewards[:, a] + gamma * (matrix @ V)
+                                for a, matrix in enumerate(self.get_transition_matrices())])
+
+    def set_cells(self, cells):
+        """
+        Changes the type of the given cells (Cell objects or (row, col, cell_type)
+        tuples) and patches the compiled transition model in place.
+        Returns the indices of the changed cells and their neighbours,
+        the states whose transitions may have changed.
+        """
+        table = self.get_transition_table()
+        touched = set()
+        for cell in cells:
+            row, col, cell_type = (cell.row, cell.col, cell.cell_type) if isinstance(cell, Cell) else cell
+            self.grid_map.set_cell_type(row, col, cell_type)
+            state = row * self.get_width() + col
+            touched.add(state)
+            touched.update(table.neighbours(state))
+
+        touched = sorted(touched)
+        table.update_cells(self.grid_map.wall_mask(), self.grid_map.goal_mask(), touched)
+        # Sparse matrices are rebuilt from the patched table on next use
+        self._transition_matrices = None
+        self._expected_rewards = None
+        return touched
 
     def get_cells(self):
         return self.grid_map.get_cells()
@@ -17,23 +147,16 @@ class GridWorld:
         return self.grid_map.get_height()
 
     def propose_move(self, current_cell, action):
-        """Simulates the effect of an action from a given cell."""
+        """Simulates the effect of an action (name or Action code) from a given cell."""
         if current_cell.is_goal():
             return current_cell # Agent stays at goal
 
-        new_row, new_col = current_cell.row, current_cell.col
-
-        if action == 'GO_NORTH':
-            new_row -= 1
-        elif action == 'GO_EAST':
-            new_col += 1
-        elif action == 'GO_SOUTH':
-            new_row += 1
-        elif action == 'GO_WEST':
-            new_col -= 1
-        else:
+        code = action_code(action)
+        if code == Action.NONE:
             # Handle 'NONE' or invalid actions: agent stays put
             return current_cell
+        d_row, d_col = ACTION_DELTAS[code]
+        new_row, new_col = current_cell.row + d_row, current_cell.col + d_col
 
         proposed_cell = self.grid_map.get_cell_by_coords(new_row, new_col)
 
@@ -46,8 +169,15 @@ class GridWorld:
     def get_transition_probability(self, old_state, new_state, action):
         """
         Determines the transition probability.
-        In this deterministic gridworld, it's 1 for the correct next state, 0 otherwise.
+        In a deterministic gridworld, it's 1 for the correct next state, 0 otherwise.
         """
+        if self.is_stochastic():
+            code = action_code(action)
+            if code == Action.NONE:
+                return 1 if old_state == new_state else 0
+            matrix = self.get_transition_matrices()[code]
+            return matrix[old_state.get_index(), new_state.get_index()]
+
         if old_state.is_goal():
             # Rule 4: Don't transition from the goal cell, stay at goal
             return 1 if old_state == new_state else 0
@@ -0,0 +1,114 @@
+import heapq
+import numpy as np
+from src.transition_table import Action
+
+
+class IncrementalStats:
+    """Work done by an incremental re-solve."""
+    def __init__(self):
+        self.touched = 0  # states whose transitions changed
+        self.invalidated = 0  # states whose old value lost its support
+        self.backups = 0
+        self.full_solve = False
+
+    def __repr__(self):
+        return (f"IncrementalStats(touched={self.touched}, invalidated={self.invalidated}, "
+                f"backups={self.backups}, full_solve={self.full_solve})")
+
+
+def resolve_changed_cells(grid_world, policy, cells, gamma=1, theta=0.01, max_iterations=500):
+    """
+    Applies the cell changes to grid_world and brings the value-iteration
+    solution in policy (values and actions) up to date in place.
+
+    Starting from the previous values, only the affected region is revisited:
+    1. Invalidation: a dirty frontier grows from the changed cells through
+       every state whose backup fell below its value (it lost the successor
+       that supported it); such states are reset to a lower bound.
+    2. Repair: a max-heap of candidate values re-propagates the values into the
+       invalidated region and out of cells that improved, highest value first.
+    The result matches a full Policy.value_iteration: states that cannot reach a
+    goal get -1 / (1 - gamma), or with gamma = 1 the -(max_iterations + 1) the
+    capped sweeps leave them at. Stochastic gridworlds fall back to a full solve.
+    """
+    from src.policy import Policy
+
+    stats = IncrementalStats()
+    touched = grid_world.set_cells(cells)
+    stats.touched = len(touched)
+
+    if grid_world.is_stochastic():
+        solution = Policy.value_iteration(grid_world, gamma, theta, max_iterations=max_iterations)
+        policy.policy, policy.values = solution.policy, solution.values
+        stats.full_solve = True
+        return stats
+
+    table = grid_world.get_transition_table()
+    next_states, rewards, walls, goals = table.next_states, table.rewards, table.walls, table.goals
+    V = policy.values
+    lower_bound = -np.inf if gamma >= 1 else np.min(rewards, initial=-1.0) / (1 - gamma)
+
+    def bellman_value(s):
+        return np.max(rewards[s] + gamma * V[next_states[s]])
+
+    def is_active(s):
+        return not (walls[s] or goals[s])
+
+    # Walls and goals have fixed values, newly opened cells start out unsupported
+    for s in touched:
+        if not is_active(s):
+            V[s] = 0
+
+    # 1. Invalidation
+    invalid = set()
+    frontier = [s for s in touched if is_active(s)]
+    tolerance = theta if gamma < 1 else 1e-9
+    while frontier:
+        s = frontier.pop()
+        if s in invalid or not is_active(s):
+            continue
+        if bellman_value(s) < V[s] - tolerance or not np.isfinite(V[s]):
+            invalid.add(s)
+            V[s] = lower_bound
+            frontier.extend(table.neighbours(s))
+    stats.invalidated = len(invalid)
+
+    # 2. Repair, in decreasing order of candidate value
+    heap = []
+    changed = set(touched) | invalid
+    for s in changed:
+        if is_active(s):
+            candidate = bellman_value(s)
+            if candidate > V[s]:
+                heap.append((-candidate, s))
+    heapq.heapify(heap)
+    while heap:
+        _, s = heapq.heappop(heap)
+        value = bellman_value(s)
+        if not value > V[s]:
+            continue  # stale entry
+        V[s] = value
+        stats.backups += 1
+        changed.add(s)
+        for p in table.neighbours(s) + [s]:
+            if is_active(p):
+                candidate = bellman_value(p)
+                if candidate > V[p]:
+                    heapq.heappush(heap, (-candidate, p))
+
+    # States left without a path to a goal
+    if gamma >= 1:
+        for s in changed:
+            if V[s] == -np.inf:
+                V[s] = -(max_iterations + 1)
+
+    # Greedy actions can only change next to states whose value changed
+    region = set(changed)
+    for s in changed:
+        region.update(table.neighbours(s))
+    for s in region:
+        if goals[s] or walls[s]:
+            policy.policy[s] = Action.NONE
+        else:
+            policy.policy[s] = np.argmax(rewards[s] + gamma * V[next_states[s]])
+    return stats
@@ -0,0 +1,80 @@
+import json
+import time
+
+# Solvers report their progress as plain dict records to an optional callback:
+#   'sweep':       one per sweep (engine, sweep, max_residual, updated states, seconds)
+#   'improvement': one per policy-iteration step (iteration, sweeps, changed states, seconds)
+#   'done':        one per solve (converged, sweeps, backups, max_residual, seconds)
+# Without a callback nothing is timed or built, so tracing costs one None check per sweep.
+
+
+def with_fields(callback, **fields):
+    """Callback that adds fields (e.g. solver='value_iteration') to every record, or None without a callback."""
+    if callback is None:
+        return None
+
+    def tagged(record):
+        callback({**fields, **record})
+    return tagged
+
+
+def report_sweep(callback, stats, updated, started):
+    """Reports the sweep just counted in stats, which started at perf_counter() time started; returns the time now."""
+    now = time.perf_counter()
+    callback({'event': 'sweep', 'engine': stats.engine, 'sweep': stats.sweeps,
+              'max_residual': float(stats.max_diff), 'updated': updated, 'seconds': now - started})
+    return now
+
+
+def report_done(callback, stats, started):
+    """Reports the end of a solve with the SweepStats of its last evaluation."""
+    callback({'event': 'done', 'engine': stats.engine, 'converged': bool(stats.converged), 'sweeps': stats.sweeps,
+              'backups': stats.backups, 'max_residual': float(stats.max_diff),
+              'seconds': time.perf_counter() - started})
+
+
+class SolverTrace:
+    """Callback that keeps every record in memory, for inspecting a solve afterwards."""
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def events(self, event, solver=None):
+        """Records of one event type, optionally only those of one solver."""
+        return [record for record in self.records
+                if record['event'] == event and (solver is None or record.get('solver') == solver)]
+
+    def residuals(self, solver=None):
+        """Max Bellman residual after every sweep."""
+        return [record['max_residual'] for record in self.events('sweep', solver)]
+
+    def unconverged(self):
+        """'done' records of solves that stopped at max_iterations without converging."""
+        return [record for record in self.events('done') if not record['converged']]
+
+    def __len__(self):
+        return len(self.records)
+
+
+class JsonLinesTrace:
+    """Callback that writes every record as one line of JSON to a path or an open text file."""
+    def __init__(self, file):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, 'w') if self._owns_file else file
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,118 @@
+import numpy as np
+from src.sweeps import SweepStats, backward_bfs, make_backup
+
+# CG is not offered: I - gamma * P_pi is not symmetric
+LINEAR_SOLVERS = ('spsolve', 'gmres', 'neumann')
+# Most series terms the 'neumann' solver sums before giving up
+NEUMANN_MAX_TERMS = 100000
+
+
+def is_singular(grid_world, actions, gamma):
+    """
+    With gamma = 1, I - P_pi is singular exactly when some state never
+    reaches a goal under the policy (its value would be unbounded).
+    """
+    if gamma < 1:
+        return False
+    backup = make_backup(grid_world, gamma, actions)
+    goals = np.flatnonzero(grid_world.get_transition_table().goals)
+    _, reaches_goal = backward_bfs(backup, goals)
+    return not reaches_goal.all()
+
+
+class PolicyChain:
+    """
+    The Markov reward process of a fixed policy over the non-wall, non-goal
+    states: P_pi restricted to them and A = I - gamma * P_pi. Walls are never
+    entered and goal values are 0, so only transitions between these states
+    remain. The sparse LU factorization of A is computed on first use and
+    reused for every later solve, so many reward variants cost one
+    factorization. actions[s] is an action index or -1 for 'NONE'.
+    """
+    def __init__(self, grid_world, actions, gamma):
+        import scipy.sparse
+
+        table = grid_world.get_transition_table()
+        self.gamma = gamma
+        self.n_states = table.n_states
+        self.states = table.active
+        self.P = grid_world.build_transition_matrix(actions)[self.states]
+        self.P_active = self.P[:, self.states]
+        self.A = scipy.sparse.identity(len(self.states), format='csr') - gamma * self.P_active
+        self.state_rewards = grid_world.get_state_rewards()
+        self._lu = None
+
+    def factorize(self):
+        """SuperLU factorization of A, cached."""
+        import scipy.sparse.linalg
+
+        if self._lu is None:
+            self._lu = scipy.sparse.linalg.splu(self.A.tocsc())
+        return self._lu
+
+    def solve(self, state_rewards=None, solver='spsolve', tol=1e-10, max_iterations=NEUMANN_MAX_TERMS):
+        """
+        Values of the policy for rewards by entered state, shape (n_states,)
+        or (n_states, k) for k reward variants at once (default: the grid
+        world's, see GridWorld.get_state_rewards). 'spsolve' uses the cached
+        LU factorization for all columns, 'gmres' runs restarted GMRES per
+        column and 'neumann' sums r + gamma P r + gamma^2 P^2 r + ... for all
+        columns until a term drops below tol.
+        Returns (V, SweepStats) with V shaped like the rewards, 0 on walls
+        and goals; sweeps counts GMRES iterations or series terms.
+        """
+        import scipy.sparse.linalg
+
+        if solver not in LINEAR_SOLVERS:
+            raise ValueError(f"Unknown linear solver '{solver}', expected one of {LINEAR_SOLVERS}.")
+        if state_rewards is None:
+            state_rewards = self.state_rewards
+        rewards = self.P @ np.asarray(state_rewards, dtype=float)
+
+        stats = SweepStats(solver)
+        if solver == 'spsolve':
+            solution = self.factorize().solve(rewards)
+            stats.converged = True
+        elif solver == 'gmres':
+            def count_iteration(residual_norm):
+                stats.sweeps += 1
+
+            columns = rewards.reshape(len(rewards), -1)
+            solution = np.empty_like(columns)
+            stats.converged = True
+            for column in range(columns.shape[1]):
+                solution[:, column], info = scipy.sparse.linalg.gmres(
+                    self.A, columns[:, column], rtol=tol, atol=0, restart=50, callback=count_iteration,
+                    callback_type='pr_norm')
+                stats.converged &= info == 0
+            solution = solution.reshape(rewards.shape)
+        else:
+            solution = rewards.copy()
+            term = rewards
+            while stats.sweeps < max_iterations:
+                term = self.gamma * (self.P_active @ term)
+                solution += term
+                stats.sweeps += 1
+                if np.max(np.abs(term), initial=0) < tol:
+                    stats.converged = True
+                    break
+
+        V = np.zeros((self.n_states,) + rewards.shape[1:])
+        V[self.states] = solution
+        stats.max_diff = np.max(np.abs(self.A @ solution - rewards), initial=0)
+        return V, stats
+
+
+def evaluate_linear(grid_world, actions, gamma, solver='spsolve', tol=1e-10):
+    """
+    Exact policy evaluation: solves (I - gamma * P_pi) V = r_pi over the
+    non-wall, non-goal states with a sparse direct (SuperLU), iterative
+    (restarted GMRES) or Neumann series solver (see PolicyChain).
+    actions[s] is an action index or -1 for 'NONE'.
+    Returns (V, SweepStats) or None if the system is singular.
+    """
+    if solver not in LINEAR_SOLVERS:
+        raise ValueError(f"Unknown linear solver '{solver}', expected one of {LINEAR_SOLVERS}.")
+    if is_singular(grid_world, actions, gamma):
+        return None
+    return PolicyChain(grid_world, actions, gamma).solve(solver=solver, tol=tol)
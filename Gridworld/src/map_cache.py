@@ -0,0 +1,89 @@
+import hashlib
+import mmap
+import os
+import struct
+import numpy as np
+
+# Compiled caches are written next to the source file: map01.grid -> map01.grid.gwcache
+CACHE_SUFFIX = '.gwcache'
+MAGIC = b'GWCACHE'
+VERSION = 2
+
+# Header: magic, version, kind ('map'/'policy'), blake2b hash of the source file, array count
+_HEADER = struct.Struct('<7sB8s16sI')
+# Per array: name, stored dtype, dtype to restore on load, ndim, shape (up to 2 dimensions)
+_ARRAY_HEADER = struct.Struct('<16s8s8sBQQ')
+
+
+def cache_path_for(file_path):
+    return file_path + CACHE_SUFFIX
+
+
+def content_hash(file_path):
+    """16-byte blake2b digest of the file contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        if f.seek(0, 2) > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                digest.update(buffer)
+    return digest.digest()
+
+
+def _compact(array):
+    """
+    Array in the smallest dtype that stores it losslessly: int8 for small
+    integral values (e.g. action codes), then int32 or float32.
+    """
+    if array.dtype.kind not in 'if' or array.dtype.itemsize == 1 or array.size == 0:
+        return array
+    candidates = (np.int8, np.int32) if array.dtype.kind == 'i' else (np.int8, np.float32)
+    for dtype in candidates:
+        narrow = array.astype(dtype)
+        if np.array_equal(narrow, array):
+            return narrow
+    return array
+
+
+def write_cache(cache_path, kind, source_hash, arrays):
+    """
+    Writes the named arrays (1D or 2D) to cache_path. The file is replaced
+    atomically; failures to write (e.g. read-only directories) are ignored.
+    """
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, kind.encode('ascii'), source_hash, len(arrays)))
+            for name, array in arrays.items():
+                stored = np.ascontiguousarray(_compact(array))
+                shape = tuple(array.shape) + (0,) * (2 - array.ndim)
+                f.write(_ARRAY_HEADER.pack(name.encode('ascii'), stored.dtype.str.encode('ascii'),
+                                           array.dtype.str.encode('ascii'), array.ndim, *shape))
+                f.write(stored.tobytes())
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_cache(cache_path, kind, source_hash):
+    """Returns the cached arrays by name, or None if the cache is missing, stale or unreadable."""
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, version, cached_kind, cached_hash, n_arrays = _HEADER.unpack(f.read(_HEADER.size))
+            if (magic != MAGIC or version != VERSION or cached_kind.rstrip(b'\0') != kind.encode('ascii')
+                    or cached_hash != source_hash):
+                return None
+
+            arrays = {}
+            for _ in range(n_arrays):
+                name, stored_dtype, dtype, ndim, *shape = _ARRAY_HEADER.unpack(f.read(_ARRAY_HEADER.size))
+                shape = tuple(shape[:ndim])
+                count = int(np.prod(shape))
+                array = np.fromfile(f, dtype=np.dtype(stored_dtype.rstrip(b'\0').decode('ascii')), count=count)
+                if array.size != count:
+                    return None
+                dtype = np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+                arrays[name.rstrip(b'\0').decode('ascii')] = array.reshape(shape).astype(dtype, copy=False)
+            return arrays
+    except (OSError, struct.error, ValueError, TypeError):
+        return None
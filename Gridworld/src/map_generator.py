@@ -0,0 +1,104 @@
+import numpy as np
+from src.map_parser import Map, WALL, GOAL, EMPTY
+
+MAP_KINDS = ('open', 'maze', 'cave', 'corridors')
+
+
+def _side(cells):
+    """Side of a square map with about the given number of cells (at least 5)."""
+    return max(int(round(np.sqrt(cells))), 5)
+
+
+def _with_border(cell_types):
+    cell_types[0, :] = cell_types[-1, :] = WALL
+    cell_types[:, 0] = cell_types[:, -1] = WALL
+    return cell_types
+
+
+def open_field(side, rng, obstacles=0.05):
+    """Open field with a few scattered single-cell walls, goal in the top right corner like map01."""
+    cell_types = np.where(rng.random((side, side)) < obstacles, WALL, EMPTY).astype(np.uint8)
+    _with_border(cell_types)
+    cell_types[1, side - 2] = GOAL
+    return cell_types
+
+
+def maze(side, rng):
+    """
+    Perfect maze on the odd cells (binary-tree algorithm: every cell opens
+    the passage to its north or east neighbour), goal in the top right corner.
+    """
+    cell_types = np.full((side, side), WALL, dtype=np.uint8)
+    rows, cols = np.arange(1, side - 1, 2), np.arange(1, side - 1, 2)
+    cell_types[np.ix_(rows, cols)] = EMPTY
+
+    grid_rows, grid_cols = np.meshgrid(rows, cols, indexing='ij')
+    top = grid_rows == rows[0]
+    right = grid_cols == cols[-1]
+    north = np.where(top, False, np.where(right, True, rng.random(grid_rows.shape) < 0.5))
+    carve = ~(top & right)
+    cell_types[grid_rows[carve & north] - 1, grid_cols[carve & north]] = EMPTY
+    cell_types[grid_rows[carve & ~north], grid_cols[carve & ~north] + 1] = EMPTY
+    _with_border(cell_types)
+    cell_types[rows[0], cols[-1]] = GOAL
+    return cell_types
+
+
+def cave(side, rng, fill=0.42, smoothing=4):
+    """
+    Cave by cellular automaton: random walls, then a cell becomes wall when at
+    least 5 of its 3x3 neighbourhood are. Pockets may be cut off from the
+    goal, which sits on the free cell nearest to the centre.
+    """
+    walls = rng.random((side, side)) < fill
+    for _ in range(smoothing):
+        padded = np.pad(walls, 1, constant_values=True).astype(np.uint8)
+        neighbourhood = sum(padded[1 + d_row:side + 1 + d_row, 1 + d_col:side + 1 + d_col]
+                            for d_row in (-1, 0, 1) for d_col in (-1, 0, 1))
+        walls = neighbourhood >= 5
+    cell_types = _with_border(np.where(walls, WALL, EMPTY).astype(np.uint8))
+
+    free = np.argwhere(cell_types == EMPTY)
+    if len(free) == 0:
+        cell_types[side // 2, side // 2] = GOAL
+    else:
+        centre = free[np.argmin(np.abs(free - side // 2).sum(axis=1))]
+        cell_types[tuple(centre)] = GOAL
+    return cell_types
+
+
+def corridors(side, rng):
+    """
+    One serpentine corridor through the whole map: walls on every other row
+    with a gap alternating between the ends, so the path is about side^2 / 2
+    moves long. Goal at the end of the top corridor.
+    """
+    cell_types = _with_border(np.full((side, side), EMPTY, dtype=np.uint8))
+    for i, row in enumerate(range(2, side - 2, 2)):
+        cell_types[row, 1:side - 1] = WALL
+        cell_types[row, side - 2 if i % 2 == 0 else 1] = EMPTY
+    cell_types[1, 1] = GOAL
+    return cell_types
+
+
+def generate_map(kind, cells, seed=0):
+    """Square Map of the given kind (see MAP_KINDS) with about the given number of cells."""
+    rng = np.random.default_rng(seed)
+    side = _side(cells)
+    if kind == 'open':
+        return Map(open_field(side, rng))
+    elif kind == 'maze':
+        return Map(maze(side, rng))
+    elif kind == 'cave':
+        return Map(cave(side, rng))
+    elif kind == 'corridors':
+        return Map(corridors(side, rng))
+    else:
+        raise ValueError(f"Unknown map kind '{kind}', expected one of {MAP_KINDS}.")
+
+
+def random_policy(grid_map, seed=0):
+    """int8 action codes: a random move on every free cell, Action.NONE on walls and goals."""
+    rng = np.random.default_rng(seed)
+    free = grid_map.cell_types.ravel() == EMPTY
+    return np.where(free, rng.integers(0, 4, free.size), -1).astype(np.int8)
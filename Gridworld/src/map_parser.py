@@ -1,6 +1,15 @@
-import numpy as np
+from src.grid_loader import load_grid, load_grid_text
+from src.map_cache import cache_path_for, content_hash, read_cache, write_cache
+
+# Cell types are stored as the byte of their map character
+WALL = ord('#')
+GOAL = ord('X')
+EMPTY = ord(' ')
 
 class Cell:
+    # Cells are lightweight views created on demand from Map.cell_types
+    __slots__ = ('row', 'col', 'cell_type', 'index')
+
     def __init__(self, row, col, cell_type, index):
         self.row = row
         self.col = col
@@ -22,20 +31,53 @@ class Cell:
     def get_index(self):
         return self.index
 
+    def __eq__(self, other):
+        if not isinstance(other, Cell):
+            return NotImplemented
+        return self.index == other.index and self.cell_type == other.cell_type
+
+    def __hash__(self):
+        return hash(self.index)
+
+class CellSequence:
+    """Read-only, list-like sequence of Cell views over a Map."""
+    def __init__(self, grid_map):
+        self.grid_map = grid_map
+
+    def __len__(self):
+        return self.grid_map.width * self.grid_map.height
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Cell index out of range.")
+        return self.grid_map.get_cell_by_coords(*divmod(index, self.grid_map.width))
+
+    def __iter__(self):
+        width = self.grid_map.width
+        for index, code in enumerate(self.grid_map.cell_types.ravel().tolist()):
+            yield Cell(index // width, index % width, chr(code), index)
+
 class Map:
-    def __init__(self, grid_cells, width, height):
-        self.grid_cells = grid_cells # A flattened list of Cell objects
-        self.width = width
-        self.height = height
+    def __init__(self, cell_types):
+        self.cell_types = cell_types # uint8 array of shape (height, width), one byte per cell
+        self.height, self.width = cell_types.shape
+
+    @property
+    def grid_cells(self):
+        return CellSequence(self)
 
     def get_cell_by_coords(self, row, col):
         if 0 <= row < self.height and 0 <= col < self.width:
             # Calculate index from row and col
-            return self.grid_cells[row * self.width + col]
+            return Cell(row, col, chr(self.cell_types[row, col]), row * self.width + col)
         return None
 
     def get_cells(self):
-        return self.grid_cells
+        return CellSequence(self)
 
     def get_width(self):
         return self.width
@@ -43,24 +85,43 @@ class Map:
     def get_height(self):
         return self.height
 
+    def is_wall(self, row, col):
+        return self.cell_types[row, col] == WALL
+
+    def is_goal(self, row, col):
+        return self.cell_types[row, col] == GOAL
+
+    def set_cell_type(self, row, col, cell_type):
+        self.cell_types[row, col] = ord(cell_type)
+
+    def wall_mask(self):
+        return self.cell_types == WALL
+
+    def goal_mask(self):
+        return self.cell_types == GOAL
+
 class MapParser:
-    def parse_map(self, file_path):
-        with open(file_path, 'r') as f:
-            lines = [line.strip() for line in f if line.strip()]
-
-        if not lines:
-            raise ValueError("Map file is empty.")
-
-        height = len(lines)
-        width = len(lines[0])
-        grid_cells = []
-        index = 0
-
-        for r, line in enumerate(lines):
-            if len(line) != width:
-                raise ValueError("Map rows must have consistent width.")
-            for c, char in enumerate(line):
-                grid_cells.append(Cell(r, c, char, index))
-                index += 1
-        
-        return Map(grid_cells, width, height)
\ No newline at end of file
+    def parse_map(self, file_path, rows=None, cols=None, use_cache=True):
+        """
+        Parses a .grid file. rows and cols optionally select a sub-window
+        of the map as slices or (start, stop) tuples.
+        Whole maps are compiled to a binary cache of their cell types next to
+        the file and reloaded from it while the file is unchanged; the
+        transition table is built only when a GridWorld first needs it.
+        """
+        if not use_cache or rows is not None or cols is not None:
+            return Map(load_grid(file_path, rows, cols, kind="Map"))
+
+        source_hash = content_hash(file_path)
+        cache_path = cache_path_for(file_path)
+        cached = read_cache(cache_path, 'map', source_hash)
+        if cached is not None:
+            return Map(cached['cell_types'])
+
+        grid_map = Map(load_grid(file_path, kind="Map"))
+        write_cache(cache_path, 'map', source_hash, {'cell_types': grid_map.cell_types})
+        return grid_map
+
+    def parse_map_string(self, grid_string):
+        """Parses a map given as text, one row per line, with the same rules as a .grid file."""
+        return Map(load_grid_text(grid_string, kind="Map"))
@@ -0,0 +1,108 @@
+import numpy as np
+from src.map_parser import Map, WALL, GOAL, EMPTY
+from src.gridworld import GridWorld
+from src.sweeps import SweepStats, backward_bfs, make_backup, run_sweeps
+from src.instrumentation import with_fields
+
+# Cells per block side when coarsening, and the smallest side a coarse level may have
+COARSENING_FACTOR = 2
+MIN_COARSE_SIZE = 16
+
+
+def coarsen_map(grid_map, factor=COARSENING_FACTOR):
+    """
+    Map with one cell per factor x factor block: a goal if the block holds a
+    goal, a wall if more than half of it is wall (cells outside the map count
+    as wall), empty otherwise.
+    """
+    height, width = grid_map.get_height(), grid_map.get_width()
+    coarse_height, coarse_width = -(-height // factor), -(-width // factor)
+    cell_types = np.full((coarse_height * factor, coarse_width * factor), WALL, dtype=np.uint8)
+    cell_types[:height, :width] = grid_map.cell_types
+    blocks = cell_types.reshape(coarse_height, factor, coarse_width, factor)
+
+    walls = np.count_nonzero(blocks == WALL, axis=(1, 3)) * 2 > factor * factor
+    goals = np.any(blocks == GOAL, axis=(1, 3))
+    coarse = np.where(goals, GOAL, np.where(walls, WALL, EMPTY)).astype(np.uint8)
+    return Map(coarse)
+
+
+def map_hierarchy(grid_map, factor=COARSENING_FACTOR, min_size=MIN_COARSE_SIZE):
+    """The map followed by ever coarser maps, as long as both sides stay at least min_size."""
+    levels = [grid_map]
+    while min(levels[-1].get_height(), levels[-1].get_width()) >= min_size * factor:
+        levels.append(coarsen_map(levels[-1], factor))
+    return levels
+
+
+def prolongate(coarse_V, coarse_map, fine_map, factor, scale, floor):
+    """
+    Warm start for the fine map: every cell takes the value of its block,
+    scaled from coarse to fine steps. Blocks that are walls on the coarse map
+    have no value and start at floor.
+    """
+    coarse_values = np.where(coarse_map.wall_mask().ravel(), floor, scale * coarse_V)
+    coarse_values = coarse_values.reshape(coarse_map.get_height(), coarse_map.get_width())
+    fine = np.repeat(np.repeat(coarse_values, factor, axis=0), factor, axis=1)
+    return fine[:fine_map.get_height(), :fine_map.get_width()].ravel()
+
+
+def _unreachable_value(gamma, max_iterations):
+    """
+    Value of a state that never reaches a goal: its fixed point -1 / (1 - gamma),
+    or with gamma = 1 the -(max_iterations + 1) capped sweeps leave it at.
+    """
+    return -1 / (1 - gamma) if gamma < 1 else -float(max_iterations + 1)
+
+
+def solve_multigrid(grid_world, gamma=1, theta=0.01, engine='gauss_seidel', max_iterations=500,
+                    factor=COARSENING_FACTOR, min_size=MIN_COARSE_SIZE, callback=None):
+    """
+    Value iteration by nested coarse-to-fine solves. The map is coarsened into
+    factor x factor blocks until it is small (see map_hierarchy), where one
+    coarse move stands for factor fine moves, so the coarse problem uses
+    gamma ** factor. Each level is solved with the given sweep engine, warm
+    started from the prolongated solution of the level below, and the finest
+    level is refined to theta; it ends at the same fixed point as solving from
+    V = 0, with far fewer sweeps once values no longer have to travel the
+    length of the map one cell per sweep.
+
+    States that cannot reach a goal are not swept: they are set to their fixed
+    point, or with gamma = 1 to the value the capped sweeps leave them at (and
+    the solve reports no convergence, like the other engines).
+    Returns (V, SweepStats) with the sweeps of the finest level and the
+    backups of all levels. The callback's sweep records carry the level
+    (0 is the original map).
+    """
+    levels = map_hierarchy(grid_world.grid_map, factor, min_size)
+    total = SweepStats('multigrid')
+    V = None
+    for level in range(len(levels) - 1, -1, -1):
+        steps = factor ** level  # fine moves per move on this level
+        level_gamma = gamma ** steps
+        world = grid_world if level == 0 else GridWorld(levels[level], grid_world.slip, grid_world.slip_model)
+        table = world.get_transition_table()
+        floor = _unreachable_value(level_gamma, max_iterations)
+        if gamma == 1:
+            floor /= steps
+
+        if V is None:
+            V = np.zeros(table.n_states)
+        else:
+            # One move here is factor moves on the level above: sum_{i < factor} gamma^(steps * i) per reward
+            scale = factor if gamma == 1 else (1 - level_gamma ** factor) / (1 - level_gamma)
+            V = prolongate(V, levels[level + 1], levels[level], factor, scale, floor)
+            V[table.walls | table.goals] = 0
+
+        backup = make_backup(world, level_gamma)
+        goals = np.flatnonzero(table.goals)
+        _, reachable = backward_bfs(backup, goals)
+        V[backup.states[~reachable]] = floor
+        stats = run_sweeps(engine, backup.subset(np.flatnonzero(reachable)), V, theta, max_iterations,
+                           roots=goals, callback=with_fields(callback, level=level))
+        total.backups += stats.backups
+
+    total.sweeps = stats.sweeps
+    total.max_diff = stats.max_diff
+    total.converged = stats.converged and (gamma < 1 or reachable.all())
+    return V, total
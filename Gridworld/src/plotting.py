@@ -0,0 +1,162 @@
+import math
+import platform
+import numpy as np
+from src.map_parser import WALL, GOAL
+
+# matplotlib is optional: it is only imported when something is drawn, so the
+# solvers (and batch workers) start without it
+_plt = None
+_headless = False
+
+# Rendering limits, in displayed cells: text labels and grid lines only on small
+# maps, arrows up to ARROW_LIMIT; maps wider or taller than MAX_DISPLAY_SIDE are
+# averaged down in blocks so drawing time does not grow with the map
+LABEL_LIMIT = 25 * 25
+ARROW_LIMIT = 120 * 120
+MAX_DISPLAY_SIDE = 600
+
+# Arrow direction of each action on screen (u right, v up)
+ARROW_U = np.array([0.0, 1.0, 0.0, -1.0])
+ARROW_V = np.array([1.0, 0.0, -1.0, 0.0])
+
+
+def use_headless():
+    """
+    Renders with the non-interactive Agg backend, e.g. for --save-png on
+    machines without a display. Has no effect once pyplot is loaded.
+    """
+    global _headless
+    _headless = True
+
+
+def _pyplot():
+    """Imports matplotlib.pyplot on first use and sets up fonts."""
+    global _plt
+    if _plt is None:
+        try:
+            import matplotlib
+        except ImportError as e:
+            raise ImportError("Plotting requires matplotlib (pip install matplotlib), "
+                              "run without plots (--no-plot) instead.") from e
+        if _headless:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        # 根据操作系统配置中文字体
+        system = platform.system()
+        if system == 'Windows':
+            matplotlib.rc('font', family='Microsoft YaHei')
+        elif system == 'Darwin':  # macOS
+            matplotlib.rc('font', family='Arial Unicode MS')
+        elif system == 'Linux':
+            matplotlib.rc('font', family='WenQuanYi Micro Hei')
+
+        # 设置全局字体属性
+        matplotlib.rcParams['axes.unicode_minus'] = False  # 正确显示负号
+        _plt = plt
+    return _plt
+
+
+def _block_reduce(array, factor, fill):
+    """Sums factor x factor blocks of a 2D array, padding the edges with fill."""
+    height, width = array.shape
+    padded_height, padded_width = -(-height // factor) * factor, -(-width // factor) * factor
+    padded = np.full((padded_height, padded_width), fill, dtype=array.dtype)
+    padded[:height, :width] = array
+    return padded.reshape(padded_height // factor, factor, padded_width // factor, factor).sum(axis=(1, 3))
+
+
+def _window(window, size):
+    if window is None:
+        return slice(0, size)
+    return slice(*window) if isinstance(window, tuple) else window
+
+
+def draw_value_function(V, grid_world, policy=None, title="Value Function", save_path=None,
+                        rows=None, cols=None):
+    """
+    Draws the value function (and policy arrows) of a gridworld as one heatmap
+    with walls masked out and one quiver of arrows. Values and actions are only
+    written into the cells of small maps; maps larger than MAX_DISPLAY_SIDE are
+    downsampled by averaging blocks of cells (walls only where a whole block is
+    wall, arrows along the mean direction). rows and cols select a tile of the
+    map to draw at full resolution, as slices or (start, stop) tuples.
+    The figure is shown interactively, or written to save_path as a PNG
+    without opening a window.
+    """
+    if save_path is not None:
+        use_headless()
+    plt = _pyplot()
+
+    height, width = grid_world.get_height(), grid_world.get_width()
+    rows, cols = _window(rows, height), _window(cols, width)
+    cell_types = grid_world.grid_map.cell_types[rows, cols]
+    values = np.asarray(V, dtype=float).reshape(height, width)[rows, cols]
+    walls = cell_types == WALL
+    height, width = cell_types.shape
+
+    u = v = None
+    # No arrows for a missing or empty policy (e.g. Policy() before parsing)
+    if policy is not None and len(policy.policy) == grid_world.get_height() * grid_world.get_width():
+        actions = policy.policy.reshape(grid_world.get_height(), grid_world.get_width())[rows, cols]
+        has_action = (actions >= 0) & ~walls
+        u = np.where(has_action, ARROW_U[actions], 0.0)
+        v = np.where(has_action, ARROW_V[actions], 0.0)
+
+    factor = max(1, math.ceil(max(height, width) / MAX_DISPLAY_SIDE))
+    if factor > 1:
+        # Mean value over the non-wall cells of each block
+        open_cells = _block_reduce((~walls).astype(np.int32), factor, 0)
+        value_sums = _block_reduce(np.where(walls, 0.0, values), factor, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = value_sums / open_cells
+        walls = open_cells == 0
+        if u is not None:
+            u, v = _block_reduce(u, factor, 0.0), _block_reduce(v, factor, 0.0)
+            length = np.hypot(u, v)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                u, v = np.where(length > 0, u / length, 0.0), np.where(length > 0, v / length, 0.0)
+
+    shown_height, shown_width = values.shape
+    n_shown = shown_height * shown_width
+    fig, ax = plt.subplots(figsize=(min(max(shown_width, 4), 16), min(max(shown_height, 3), 12)))
+
+    cmap = plt.cm.viridis.copy()
+    cmap.set_bad('black')  # walls
+    masked = np.ma.masked_array(values, mask=walls | ~np.isfinite(values))
+    extent = (-0.5, shown_width - 0.5, shown_height - 0.5, -0.5)
+    im = ax.imshow(masked, cmap=cmap, interpolation='nearest', extent=extent)
+
+    labels = factor == 1 and n_shown <= LABEL_LIMIT
+    if u is not None and n_shown <= ARROW_LIMIT:
+        ys, xs = np.nonzero((u != 0) | (v != 0))
+        offset = 0.2 if labels else 0.0  # arrows below the value labels
+        ax.quiver(xs, ys + offset, u[ys, xs], v[ys, xs], color='white', pivot='middle',
+                  angles='uv', scale_units='xy', scale=2.5 if labels else 1.4, headwidth=3, headlength=3, headaxislength=2.5)
+
+    if labels:
+        for (row, col), code in np.ndenumerate(cell_types):
+            if code == GOAL:
+                ax.text(col, row, "X", ha="center", va="center", color="white", fontsize=10, fontweight='bold')
+            elif code == WALL:
+                ax.text(col, row, "#", ha="center", va="center", color="white", fontsize=10)
+            else:
+                ax.text(col, row - (0.2 if u is not None else 0), f"{values[row, col]:.1f}",
+                        ha="center", va="center", color="white", fontsize=8)
+        ax.set_xticks(np.arange(-.5, shown_width, 1), minor=True)
+        ax.set_yticks(np.arange(-.5, shown_height, 1), minor=True)
+        ax.grid(which="minor", color="w", linestyle='-', linewidth=2)
+        ax.tick_params(which="minor", size=0)
+    ax.set_xticks([])
+    ax.set_yticks([])
+
+    if factor > 1:
+        title = f"{title} ({factor}x{factor} cells per block)"
+    ax.set_title(title)
+    fig.colorbar(im, ax=ax, label="State Value")
+    fig.tight_layout()
+    if save_path is not None:
+        fig.savefig(save_path)
+        plt.close(fig)
+    else:
+        plt.show()
@@ -1,26 +1,41 @@
+import time
 import numpy as np
-import copy
+from src.transition_table import Action, action_code, action_names, as_action_array
+from src.sweeps import make_backup, run_sweeps
+from src.linear_evaluation import evaluate_linear
+from src.incremental import resolve_changed_cells
+from src.policy_iteration import solve_policy_iteration
+from src.shortest_path import is_unit_cost, shortest_path_values
+from src.multigrid import solve_multigrid
+from src.tiled import solve_tiled
+from src.instrumentation import report_done, with_fields
 
 class Policy:
     def __init__(self, policy_map=None, width=0, height=0):
-        # policy_map is a flattened list of actions corresponding to cells
-        self.policy = policy_map if policy_map is not None else []
+        # One int8 Action code per cell (flattened); lists of action names are converted once
+        self.policy = as_action_array(policy_map if policy_map is not None else [])
         self.width = width
         self.height = height
         self.values = np.zeros(len(self.policy)) # To store V(s)
+        self.sweep_stats = None # SweepStats of the last evaluation
+        self.iteration_stats = None # PolicyIterationStats per iteration, after policy iteration
 
     def policy_action_for_cell(self, cell):
-        if not self.policy:
+        if len(self.policy) == 0:
             return None # No policy set
-        return self.policy[cell.get_index()]
+        return Action(self.policy[cell.get_index()]).name
+
+    def action_names(self):
+        """The policy as a flattened list of action names, e.g. for output."""
+        return action_names(self.policy)
 
     def pi(self, cell, action):
-        if not self.policy:
+        if len(self.policy) == 0:
             # Value Iteration case: consider all actions equally
             return 1 # Or 1/num_actions if you want proper probability distribution
         
         # Policy Evaluation/Iteration case: policy specifies exact action
-        if self.policy_action_for_cell(cell) == action:
+        if self.policy[cell.get_index()] == action_code(action):
             return 1
         else:
             return 0
@@ -38,7 +53,11 @@ class Policy:
     def __eq__(self, other):
         if not isinstance(other, Policy):
             return NotImplemented
-        return self.policy == other.policy
+        return np.array_equal(self.policy, other.policy)
+
+    def changed_states(self, other):
+        """Number of states whose action differs from other's."""
+        return int(np.count_nonzero(self.policy != other.policy))
 
     def __ne__(self, other):
         return not self == other
@@ -47,202 +66,174 @@ class Policy:
         return len(self.policy)
 
     # Policy Evaluation methods
-    def evaluate_policy(self, grid_world, gamma=1, theta=0.01):
+    def evaluate_policy(self, grid_world, gamma=1, theta=0.01, engine='jacobi', max_iterations=500, solver=None,
+                        callback=None):
+        """
+        Computes V(s) of this policy with the chosen sweep engine
+        ('jacobi', 'gauss_seidel', 'bfs' or 'prioritized', see src.sweeps).
+        With a solver ('spsolve', 'gmres' or 'neumann', see src.linear_evaluation)
+        the Bellman equation is solved directly, falling back to sweeps when
+        gamma = 1 and the linear system is singular.
+        Walls have no value and the goal value is fixed at 0.
+        The callback gets a record per sweep and a final 'done' record
+        (see src.instrumentation).
+        """
         if len(self.policy) != len(grid_world.get_cells()):
             raise Exception("Policy dimension doesn't fit gridworld dimension.")
-        
-        max_iterations = 500
-        V_old = None
-        # Initialize values for viable cells to 0, goal cell to 0 or a positive reward if it's the target.
-        # For Gridworld, we can initialize all to 0 and let Bellman equation propagate.
-        V_new = np.zeros(len(grid_world.get_cells()))
-        for cell in grid_world.get_cells():
-            if cell.is_goal():
-                V_new[cell.get_index()] = 0 # Goal state value is 0 or high reward based on your R(s,s')
-
-        iter_count = 0
-        
-        while True:
-            V_old = np.copy(V_new)
-            iter_count += 1
-            
-            # Policy Evaluation Sweep
-            for cell in grid_world.get_cells():
-                if cell.is_goal():
-                    continue # Goal state value is fixed
-                
-                s_idx = cell.get_index()
-                
-                # V(s) = sum_a pi(s,a) * sum_s' P(s'|s,a) * (R(s,s',a) + gamma * V(s'))
-                expected_value = 0
-                
-                # Get the action specified by the policy for this cell
-                policy_action = self.policy_action_for_cell(cell)
-                
-                # We are in a deterministic environment, so pi(s,a) will be 1 for policy_action
-                # and 0 for others.
-                
-                # Simulate the proposed move by the policy
-                proposed_next_cell = grid_world.propose_move(cell, policy_action)
-                
-                # Calculate R(s,s',a)
-                reward = grid_world.get_reward(cell, proposed_next_cell, policy_action)
-                
-                # Calculate P(s'|s,a) and V(s')
-                # In this deterministic gridworld, P(s'|s,a) is 1 for the actual next state and 0 for others
-                next_state_value = V_old[proposed_next_cell.get_index()] if proposed_next_cell else V_old[s_idx]
-                
-                expected_value = reward + gamma * next_state_value
-                V_new[s_idx] = expected_value
-
-            max_diff = np.max(np.abs(V_new - V_old))
-            if max_diff < theta:
-                print(f"Policy evaluation converged after iteration: {iter_count}")
-                break
-            
-            if iter_count > max_iterations:
-                print(f"Policy evaluation reached max iterations ({max_iterations}).")
-                break
-        
-        self.values = V_new
+        callback = with_fields(callback, solver='policy_evaluation', theta=theta)
+        started = time.perf_counter() if callback is not None else None
+
+        table = grid_world.get_transition_table()
+        # Action codes index the transition table directly, Action.NONE keeps the agent in place
+        action_indices = self.policy
+
+        if solver is not None:
+            result = evaluate_linear(grid_world, action_indices, gamma, solver)
+            if result is not None:
+                self.values, self.sweep_stats = result
+                print(f"Policy evaluation solved with {solver} ({self.sweep_stats.sweeps} iterations).")
+                if callback is not None:
+                    report_done(callback, self.sweep_stats, started)
+                return self.values
+            print("Policy evaluation: linear system is singular (gamma = 1 and a state never reaches the goal), "
+                  "falling back to sweeps.")
+
+        # Sparse mat-vec backups if the gridworld is stochastic, table gathers otherwise
+        backup = make_backup(grid_world, gamma, action_indices)
+        V = np.zeros(table.n_states)
+        self.sweep_stats = run_sweeps(engine, backup, V, theta, max_iterations, roots=np.flatnonzero(table.goals),
+                                      callback=callback)
+        if self.sweep_stats.converged:
+            print(f"Policy evaluation converged after iteration: {self.sweep_stats.sweeps} "
+                  f"({self.sweep_stats.backups} backups, {engine})")
+        else:
+            print(f"Policy evaluation reached max iterations ({max_iterations}).")
+        if callback is not None:
+            report_done(callback, self.sweep_stats, started)
+
+        self.values = V
         return self.values
 
     # Policy Improvement methods
     def improve_policy(self, grid_world, gamma=1):
-        new_policy_map = list(self.policy) # Start with current policy
-        
-        # Iterate over all cells (states)
-        for cell in grid_world.get_cells():
-            if cell.is_wall() or cell.is_goal():
-                continue # No action or improvement needed for walls/goal
-            
-            max_q_value = -np.inf
-            best_action = 'NONE'
-            
-            # Consider all possible actions
-            possible_actions = ['GO_NORTH', 'GO_EAST', 'GO_SOUTH', 'GO_WEST']
-            
-            for action in possible_actions:
-                # Calculate Q(s,a)
-                # Q(s,a) = sum_s' P(s'|s,a) * (R(s,s',a) + gamma * V(s'))
-                
-                # Simulate the proposed move
-                proposed_next_cell = grid_world.propose_move(cell, action)
-                
-                # Get the reward
-                reward = grid_world.get_reward(cell, proposed_next_cell, action)
-                
-                # Get the value of the next state (from current policy's V-function)
-                next_state_value = self.values[proposed_next_cell.get_index()] if proposed_next_cell else self.values[cell.get_index()]
-                
-                q_value = reward + gamma * next_state_value
-                
-                if q_value > max_q_value:
-                    max_q_value = q_value
-                    best_action = action
-            
-            # Update the policy for this cell
-            new_policy_map[cell.get_index()] = best_action
-            
+        new_policy_map = self.policy.copy() # Start with current policy
+
+        # Q(s,a) = sum_s' P(s'|s,a) * (R(s,s',a) + gamma * V(s')) for all cells and actions at once,
+        # the first maximizing action wins ties
+        best_actions = np.argmax(grid_world.get_q_values(self.values, gamma), axis=1)
+
+        # No action or improvement needed for walls/goal
+        active = grid_world.get_transition_table().active
+        new_policy_map[active] = best_actions[active]
+
         return Policy(new_policy_map, self.width, self.height)
 
+    # Incremental re-solve
+    def resolve_changed_cells(self, grid_world, cells, gamma=1, theta=0.01, max_iterations=500):
+        """
+        Updates this value-iteration solution in place after the given cells
+        change type, revisiting only the affected region (see src.incremental).
+        """
+        return resolve_changed_cells(grid_world, self, cells, gamma, theta, max_iterations)
+
     # Policy Iteration
     @staticmethod
-    def policy_iteration(initial_policy, grid_world, gamma=1, theta=0.01):
-        last_policy = copy.deepcopy(initial_policy)
-        improved_policy = None
-        
-        iter_count = 0
-        while True:
-            iter_count += 1
-            print(f"\nPolicy Iteration: Iteration {iter_count}")
-            
-            # Policy Evaluation Step
-            last_policy.evaluate_policy(grid_world, gamma, theta)
-            
-            # Policy Improvement Step
-            improved_policy = last_policy.improve_policy(grid_world, gamma)
-            
-            if improved_policy == last_policy:
-                print("Policy Iteration converged.")
-                break
-            
-            last_policy = improved_policy
-        
-        return improved_policy
+    def policy_iteration(initial_policy, grid_world, gamma=1, theta=0.01, engine='jacobi', solver=None, k=None,
+                         max_iterations=500, trace_memory=False, callback=None):
+        """
+        Policy iteration from initial_policy, which is left unchanged.
+        Evaluations are warm-started from the previous values; k limits them to
+        k sweeps (modified policy iteration). The returned policy holds the
+        final values and, in iteration_stats, the sweeps, changed states and
+        memory of every iteration (see src.policy_iteration). The callback
+        gets per-sweep, per-improvement and final records (see src.instrumentation).
+        """
+        policy = Policy(initial_policy.policy.copy(), initial_policy.width, initial_policy.height)
+        policy.iteration_stats = solve_policy_iteration(grid_world, policy, gamma, theta, k, engine, solver,
+                                                        max_iterations, trace_memory=trace_memory,
+                                                        callback=with_fields(callback, solver='policy_iteration',
+                                                                             theta=theta))
+        return policy
 
     # Value Iteration
     @staticmethod
-    def value_iteration(grid_world, gamma=1, theta=0.01):
-        # Initialize V(s) arbitrarily (e.g., all zeros)
-        V = np.zeros(len(grid_world.get_cells()))
-        # Ensure goal state has initial value (often 0 or reward for reaching it)
-        for cell in grid_world.get_cells():
-            if cell.is_goal():
-                V[cell.get_index()] = 0 # Or a positive reward if R(s,s') for goal is 0
-
-        max_iterations = 500
-        iter_count = 0
-
-        while True:
-            V_old = np.copy(V)
-            iter_count += 1
-            
-            for cell in grid_world.get_cells():
-                if cell.is_wall() or cell.is_goal():
-                    continue # Walls don't have values, goal is fixed
-                
-                s_idx = cell.get_index()
-                
-                max_q_value = -np.inf
-                possible_actions = ['GO_NORTH', 'GO_EAST', 'GO_SOUTH', 'GO_WEST']
-                
-                for action in possible_actions:
-                    proposed_next_cell = grid_world.propose_move(cell, action)
-                    reward = grid_world.get_reward(cell, proposed_next_cell, action)
-                    next_state_value = V_old[proposed_next_cell.get_index()] if proposed_next_cell else V_old[s_idx]
-                    
-                    q_value = reward + gamma * next_state_value
-                    
-                    if q_value > max_q_value:
-                        max_q_value = q_value
-                
-                V[s_idx] = max_q_value
-            
-            max_diff = np.max(np.abs(V - V_old))
-            if max_diff < theta:
-                print(f"Value Iteration converged after iteration: {iter_count}")
-                break
-            
-            if iter_count > max_iterations:
+    def value_iteration(grid_world, gamma=1, theta=0.01, engine='jacobi', max_iterations=500, shortest_path=True,
+                        multigrid=False, workers=None, callback=None):
+        """
+        Optimal values and greedy policy by value iteration. With multigrid
+        the map is first solved on coarsened copies and the engine refines the
+        interpolated values (see src.multigrid). With workers, tiles of the map
+        are swept with Jacobi backups in that many threads (see src.tiled). The callback gets a record
+        per sweep and a final 'done' record (see src.instrumentation); a
+        shortest-path solve has no sweeps and reports only the 'done' record.
+        """
+        callback = with_fields(callback, solver='value_iteration', theta=theta)
+        started = time.perf_counter() if callback is not None else None
+
+        # Deterministic unit-cost worlds with gamma = 1 are shortest-path problems: one BFS from
+        # the goals gives the same values as the Jacobi sweeps (see src.shortest_path)
+        if shortest_path and not multigrid and workers is None and engine == 'jacobi' \
+                and is_unit_cost(grid_world, gamma):
+            V, stats = shortest_path_values(grid_world, theta, max_iterations)
+            if stats.converged:
+                print(f"Value Iteration solved by shortest paths (equivalent to {stats.sweeps} iterations)")
+            else:
                 print(f"Value Iteration reached max iterations ({max_iterations}).")
-                break
-        
-        # After V converges, derive the optimal policy
-        optimal_policy_map = ['NONE'] * len(grid_world.get_cells())
-        for cell in grid_world.get_cells():
-            if cell.is_wall() or cell.is_goal():
-                if cell.is_goal():
-                    optimal_policy_map[cell.get_index()] = 'X' # Mark goal in policy map
-                continue
-            
-            max_q_value = -np.inf
-            best_action = 'NONE'
-            possible_actions = ['GO_NORTH', 'GO_EAST', 'GO_SOUTH', 'GO_WEST']
-            
-            for action in possible_actions:
-                proposed_next_cell = grid_world.propose_move(cell, action)
-                reward = grid_world.get_reward(cell, proposed_next_cell, action)
-                next_state_value = V[proposed_next_cell.get_index()] if proposed_next_cell else V[cell.get_index()]
-                
-                q_value = reward + gamma * next_state_value
-                
-                if q_value > max_q_value:
-                    max_q_value = q_value
-                    best_action = action
-            
-            optimal_policy_map[cell.get_index()] = best_action
-            
+            if callback is not None:
+                report_done(callback, stats, started)
+            return Policy._greedy_policy(grid_world, V, gamma, stats)
+
+        if workers is not None:
+            if engine != 'jacobi' or multigrid:
+                raise ValueError("The tiled solver only sweeps with the 'jacobi' engine.")
+            V, stats = solve_tiled(grid_world, gamma, theta, max_iterations, workers, callback=callback)
+            if stats.converged:
+                print(f"Value Iteration converged after iteration: {stats.sweeps} "
+                      f"({stats.backups} backups, tiled on {workers} threads)")
+            else:
+                print(f"Value Iteration reached max iterations ({max_iterations}).")
+            if callback is not None:
+                report_done(callback, stats, started)
+            return Policy._greedy_policy(grid_world, V, gamma, stats)
+
+        if multigrid:
+            V, stats = solve_multigrid(grid_world, gamma, theta, engine, max_iterations, callback=callback)
+            if stats.converged:
+                print(f"Value Iteration converged after iteration: {stats.sweeps} on the full map "
+                      f"({stats.backups} backups on all levels, multigrid + {engine})")
+            else:
+                print(f"Value Iteration reached max iterations ({max_iterations}).")
+            if callback is not None:
+                report_done(callback, stats, started)
+            return Policy._greedy_policy(grid_world, V, gamma, stats)
+
+        # Every sweep is a gather over the compiled transition table (sparse mat-vec products
+        # if the gridworld is stochastic) plus a max over actions
+        table = grid_world.get_transition_table()
+        backup = make_backup(grid_world, gamma)  # walls don't have values, goal is fixed
+
+        # Initialize V(s) arbitrarily (e.g., all zeros), goal value stays 0
+        V = np.zeros(table.n_states)
+        stats = run_sweeps(engine, backup, V, theta, max_iterations, roots=np.flatnonzero(table.goals),
+                           callback=callback)
+        if stats.converged:
+            print(f"Value Iteration converged after iteration: {stats.sweeps} ({stats.backups} backups, {engine})")
+        else:
+            print(f"Value Iteration reached max iterations ({max_iterations}).")
+        if callback is not None:
+            report_done(callback, stats, started)
+
+        return Policy._greedy_policy(grid_world, V, gamma, stats)
+
+    @staticmethod
+    def _greedy_policy(grid_world, V, gamma, stats):
+        # After V converges, derive the optimal policy (first maximizing action wins ties)
+        table = grid_world.get_transition_table()
+        best_actions = np.argmax(grid_world.get_q_values(V, gamma), axis=1)
+        optimal_policy_map = np.full(table.n_states, Action.NONE, dtype=np.int8) # No action at walls and goal
+        optimal_policy_map[table.active] = best_actions[table.active]
+
         optimal_policy = Policy(optimal_policy_map, grid_world.get_width(), grid_world.get_height())
         optimal_policy.values = V # Store the converged values
-        return optimal_policy
\ No newline at end of file
+        optimal_policy.sweep_stats = stats
+        return optimal_policy
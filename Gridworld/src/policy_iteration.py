@@ -0,0 +1,237 @@
+import sys
+import time
+import tracemalloc
+import numpy as np
+from src.sweeps import SweepStats, make_backup, run_sweeps
+from src.linear_evaluation import evaluate_linear
+from src.instrumentation import report_sweep, with_fields
+
+# Relative Q-value gain below which a different greedy action counts as a tie,
+# not an improvement; keeps rounding noise from flipping tied actions forever
+IMPROVEMENT_TOLERANCE = 1e-9
+
+
+class PolicyIterationStats:
+    """
+    Work and memory of one policy-iteration step. allocated_blocks is the
+    growth in live Python/NumPy memory blocks over the step (0 when nothing is
+    kept), peak_bytes the peak traced memory above the step's starting point
+    (None unless memory tracing is on).
+    """
+    def __init__(self, iteration):
+        self.iteration = iteration
+        self.sweeps = 0
+        self.improved = 0  # states whose action strictly improved
+        self.allocated_blocks = 0
+        self.peak_bytes = None
+
+    def __repr__(self):
+        return (f"PolicyIterationStats(iteration={self.iteration}, sweeps={self.sweeps}, improved={self.improved}, "
+                f"allocated_blocks={self.allocated_blocks}, peak_bytes={self.peak_bytes})")
+
+
+class PolicyIterationBuffers:
+    """
+    Preallocated arrays for policy iteration on a deterministic gridworld.
+    The transition table is extended with a fifth 'stay' column for
+    Action.NONE, so the successor and reward of every state under the current
+    policy are gathers into fixed buffers, as are the Q-values (including
+    staying put, to compare against states whose action is NONE).
+    """
+    def __init__(self, table, gamma):
+        states = table.active
+        n_positions = len(states)
+        self.states = states
+        self.gamma = gamma
+        self.n_columns = table.n_actions + 1
+        # Action-major transition table over the active states, plus the stay row
+        self.next_states = np.vstack((table.next_states[states].T, states[np.newaxis]))
+        self.rewards = np.vstack((table.rewards[states].T, np.full((1, n_positions), -1.0)))
+        self._flat_next_states = self.next_states.ravel()
+        self._flat_rewards = self.rewards.ravel()
+
+        self.policy_next = np.empty(n_positions, dtype=self.next_states.dtype)
+        self.policy_rewards = np.empty(n_positions)
+        self.new_values = np.empty(n_positions)
+        self.diff = np.empty(n_positions)
+        self.q = np.empty((table.n_actions + 1, n_positions))
+        self.best = np.empty(n_positions, dtype=np.int64)
+        self.best_q = np.empty(n_positions)
+        self.current_q = np.empty(n_positions)
+        self.actions = np.empty(n_positions, dtype=np.int8)
+        self.columns = np.empty(n_positions, dtype=np.int64)
+        self.changed = np.empty(n_positions, dtype=bool)
+        self.positions = np.arange(n_positions)
+
+    def load_policy(self, policy):
+        """Gathers the successor and reward of each state under policy (int8 action codes)."""
+        np.take(policy, self.states, out=self.actions)
+        np.copyto(self.columns, self.actions)
+        np.mod(self.columns, self.n_columns, out=self.columns)  # Action.NONE (-1) -> stay column
+        self.columns *= len(self.states)
+        self.columns += self.positions
+        np.take(self._flat_next_states, self.columns, out=self.policy_next)
+        np.take(self._flat_rewards, self.columns, out=self.policy_rewards)
+
+    def evaluate(self, V, theta, max_sweeps, callback=None):
+        """In-place Jacobi sweeps of the loaded policy from the current V; returns SweepStats."""
+        stats = SweepStats('jacobi')
+        states = self.states
+        started = time.perf_counter() if callback is not None else None
+        while stats.sweeps < max_sweeps:
+            stats.sweeps += 1
+            np.take(V, self.policy_next, out=self.new_values)
+            self.new_values *= self.gamma
+            self.new_values += self.policy_rewards
+            np.take(V, states, out=self.diff)
+            np.subtract(self.new_values, self.diff, out=self.diff)
+            np.abs(self.diff, out=self.diff)
+            stats.max_diff = self.diff.max(initial=0)
+            np.put(V, states, self.new_values)
+            stats.backups += len(states)
+            if callback is not None:
+                started = report_sweep(callback, stats, len(states), started)
+            if stats.max_diff < theta:
+                stats.converged = True
+                break
+        return stats
+
+    def improve(self, V, policy):
+        """
+        Greedy policy improvement in place, for the policy last loaded; returns
+        the number of states whose action strictly improved.
+        """
+        for a in range(len(self.q)):
+            np.take(V, self.next_states[a], out=self.q[a])
+            self.q[a] *= self.gamma
+            self.q[a] += self.rewards[a]
+        moves = self.q[:-1]
+        np.argmax(moves, axis=0, out=self.best)  # first maximizing action wins ties
+        np.max(moves, axis=0, out=self.best_q)
+        np.take(self.q.ravel(), self.columns, out=self.current_q)
+
+        # Improved where best_q - current_q > IMPROVEMENT_TOLERANCE * max(1, |current_q|)
+        np.abs(self.current_q, out=self.diff)
+        np.maximum(self.diff, 1, out=self.diff)
+        self.diff *= IMPROVEMENT_TOLERANCE
+        np.subtract(self.best_q, self.current_q, out=self.best_q)
+        np.greater(self.best_q, self.diff, out=self.changed)
+        np.put(policy, self.states, self.best)
+        return int(np.count_nonzero(self.changed))
+
+
+def _improve(grid_world, V, gamma, policy):
+    """Greedy policy improvement in place on any gridworld; returns the number of improved states."""
+    active = grid_world.get_transition_table().active
+    q = grid_world.get_q_values(V, gamma)[active]
+    positions = np.arange(len(active))
+    best = np.argmax(q, axis=1)  # first maximizing action wins ties
+    current = policy[active]
+    # Action.NONE stays put with certainty
+    current_q = np.where(current >= 0, q[positions, np.maximum(current, 0)], -1 + gamma * V[active])
+    improved = q[positions, best] - current_q > IMPROVEMENT_TOLERANCE * np.maximum(1, np.abs(current_q))
+    policy[active] = best
+    return int(np.count_nonzero(improved))
+
+
+def solve_policy_iteration(grid_world, policy, gamma=1, theta=0.01, k=None, engine='jacobi', solver=None,
+                           max_iterations=500, max_policy_iterations=1000, trace_memory=False, callback=None):
+    """
+    Policy iteration that updates policy (its action codes and values) in
+    place and returns one PolicyIterationStats per iteration.
+
+    Each evaluation is warm-started from the previous value function and runs
+    until the values change by less than theta (at most max_iterations + 1
+    sweeps), or for at most k sweeps (modified policy iteration). Iteration
+    stops once the improvement step changes no action and the values
+    converged (or, for states that never reach a goal with gamma = 1, were
+    swept max_iterations + 1 times since the last change; such states keep
+    their accumulated values). With the default Jacobi engine on a deterministic gridworld
+    every sweep and improvement works in preallocated buffers; other engines,
+    linear solvers and stochastic worlds build their backups per iteration.
+    With trace_memory the peak memory of each iteration is traced with
+    tracemalloc. The callback gets the 'sweep' records of every evaluation
+    (tagged with the iteration), an 'improvement' record per iteration and a
+    final 'done' record (see src.instrumentation).
+    """
+    if k is not None and k < 1:
+        raise ValueError("k must be at least 1 sweep per evaluation.")
+    table = grid_world.get_transition_table()
+    V = policy.values
+    if V.shape != (table.n_states,):
+        V = policy.values = np.zeros(table.n_states)
+    max_sweeps = max_iterations + 1 if k is None else k
+    buffers = None
+    if engine == 'jacobi' and solver is None and not grid_world.is_stochastic():
+        buffers = PolicyIterationBuffers(table, gamma)
+
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    history = []
+    stable_sweeps = 0
+    converged = False
+    solve_started = time.perf_counter() if callback is not None else None
+    try:
+        for iteration in range(1, max_policy_iterations + 1):
+            print(f"\nPolicy Iteration: Iteration {iteration}")
+            stats = PolicyIterationStats(iteration)
+            sweep_callback = with_fields(callback, iteration=iteration)
+            iteration_started = time.perf_counter() if callback is not None else None
+            blocks = sys.getallocatedblocks()
+            if trace_memory:
+                tracemalloc.reset_peak()
+                start_bytes = tracemalloc.get_traced_memory()[0]
+
+            # Policy Evaluation Step, starting from the previous values
+            if buffers is not None:
+                buffers.load_policy(policy.policy)
+                sweep_stats = buffers.evaluate(V, theta, max_sweeps, sweep_callback)
+            else:
+                sweep_stats = None
+                if solver is not None:
+                    result = evaluate_linear(grid_world, policy.policy, gamma, solver)
+                    if result is not None:
+                        V[:], sweep_stats = result
+                if sweep_stats is None:
+                    backup = make_backup(grid_world, gamma, policy.policy)
+                    sweep_stats = run_sweeps(engine, backup, V, theta, max_sweeps - 1,
+                                             roots=np.flatnonzero(table.goals), callback=sweep_callback)
+            policy.sweep_stats = sweep_stats
+            stats.sweeps = sweep_stats.sweeps
+
+            # Policy Improvement Step, in place
+            if buffers is not None:
+                stats.improved = buffers.improve(V, policy.policy)
+            else:
+                stats.improved = _improve(grid_world, V, gamma, policy.policy)
+
+            stats.allocated_blocks = sys.getallocatedblocks() - blocks
+            if trace_memory:
+                stats.peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+            history.append(stats)
+            if callback is not None:
+                callback({'event': 'improvement', 'iteration': iteration, 'sweeps': stats.sweeps,
+                          'changed': stats.improved, 'seconds': time.perf_counter() - iteration_started})
+
+            # A stable policy is final once its values converged or were swept as often as a
+            # full evaluation may (with gamma = 1 states that never reach a goal do not converge)
+            stable_sweeps = stable_sweeps + stats.sweeps if stats.improved == 0 else 0
+            if stats.improved == 0 and (sweep_stats.converged or stable_sweeps >= max_iterations + 1):
+                print("Policy Iteration converged.")
+                converged = True
+                break
+            print(f"Policy improved in {stats.improved} states ({stats.sweeps} evaluation sweeps).")
+        else:
+            print(f"Policy Iteration reached max iterations ({max_policy_iterations}).")
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    if callback is not None:
+        # Sweeps summed over all evaluations, residual of the last one
+        last = policy.sweep_stats
+        callback({'event': 'done', 'engine': last.engine if history else engine, 'converged': converged,
+                  'iterations': len(history), 'sweeps': sum(stats.sweeps for stats in history),
+                  'max_residual': float(last.max_diff) if history else None,
+                  'seconds': time.perf_counter() - solve_started})
+    return history
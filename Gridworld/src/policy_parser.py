@@ -1,26 +1,35 @@
+import numpy as np
 from src.policy import Policy  # 修改为绝对导入
+from src.grid_loader import load_grid
+from src.map_cache import cache_path_for, content_hash, read_cache, write_cache
+from src.transition_table import action_code
 
 class PolicyParser:
-    def parse_policy(self, file_path):
-        with open(file_path, 'r') as f:
-            lines = [line.strip() for line in f if line.strip()]
+    def __init__(self):
+        # Action code (-1 for 'NONE') for every possible byte of a .policy file
+        self._action_lookup = np.array([action_code(self._char_to_action(chr(code))) for code in range(256)],
+                                       dtype=np.int8)
 
-        if not lines:
-            raise ValueError("Policy file is empty.")
+    def parse_policy(self, file_path, rows=None, cols=None, use_cache=True):
+        """
+        Parses a .policy file. rows and cols optionally select a sub-window
+        of the policy as slices or (start, stop) tuples.
+        Whole files are cached as an int8 action code array next to the file.
+        """
+        if not use_cache or rows is not None or cols is not None:
+            actions = self._action_lookup[load_grid(file_path, rows, cols, kind="Policy")]
+        else:
+            source_hash = content_hash(file_path)
+            cache_path = cache_path_for(file_path)
+            cached = read_cache(cache_path, 'policy', source_hash)
+            if cached is not None:
+                actions = cached['actions']
+            else:
+                actions = self._action_lookup[load_grid(file_path, kind="Policy")]
+                write_cache(cache_path, 'policy', source_hash, {'actions': actions})
 
-        height = len(lines)
-        width = len(lines[0])
-        policy_map = []
-        
-        for r, line in enumerate(lines):
-            if len(line) != width:
-                raise ValueError("Policy rows must have consistent width.")
-            for c, char in enumerate(line):
-                # Map characters to actions
-                action = self._char_to_action(char)
-                policy_map.append(action)
-        
-        return Policy(policy_map, width, height)
+        height, width = actions.shape
+        return Policy(actions.ravel(), width, height)
 
     def _char_to_action(self, char):
         if char == 'N':
@@ -32,4 +41,4 @@ class PolicyParser:
         elif char == 'W':
             return 'GO_WEST'
         else:
-            return 'NONE' # For walls or goal cells where no action is taken
\ No newline at end of file
+            return 'NONE' # For walls or goal cells where no action is taken
@@ -0,0 +1,138 @@
+import time
+import numpy as np
+
+TD_METHODS = ('q_learning', 'sarsa')
+EPSILON_DECAYS = ('linear', 'exponential')
+
+
+class TDStats:
+    """Work done by a tabular TD learning run."""
+    def __init__(self, method, n_agents):
+        self.method = method
+        self.n_agents = n_agents
+        self.steps = 0  # lockstep steps, every agent makes one update per step
+        self.updates = 0
+        self.episodes = 0
+        self.seconds = 0.0
+
+    @property
+    def updates_per_second(self):
+        return self.updates / self.seconds if self.seconds > 0 else float('inf')
+
+    def __repr__(self):
+        return (f"TDStats(method={self.method!r}, n_agents={self.n_agents}, steps={self.steps}, "
+                f"updates={self.updates}, episodes={self.episodes}, "
+                f"updates_per_second={self.updates_per_second:.3g})")
+
+
+def epsilon_schedule(epsilon, n_steps, decay='linear'):
+    """
+    Exploration rate for every step: a constant, or a (start, end) pair
+    decayed linearly or exponentially (geometrically) over n_steps.
+    """
+    if np.isscalar(epsilon):
+        return np.full(n_steps, float(epsilon))
+    start, end = epsilon
+    if decay == 'linear':
+        return np.linspace(start, end, n_steps)
+    elif decay == 'exponential':
+        if start <= 0 or end <= 0:
+            raise ValueError("Exponential epsilon decay needs positive start and end values.")
+        return np.geomspace(start, end, n_steps)
+    else:
+        raise ValueError(f"Unknown epsilon decay '{decay}', expected one of {EPSILON_DECAYS}.")
+
+
+def _greedy(rows):
+    """First maximizing action and max value of every column of rows (n_actions, n)."""
+    best = rows[0].copy()
+    actions = np.zeros(rows.shape[1], dtype=np.intp)
+    for a in range(1, len(rows)):
+        actions[rows[a] > best] = a
+        np.maximum(best, rows[a], out=best)
+    return actions, best
+
+
+def learn_q(next_states, rewards, gamma, n_updates, n_agents=4096, alpha=0.1, epsilon=(1.0, 0.05),
+            decay='linear', method='q_learning', episode_length=100, start_states=None, seed=0):
+    """
+    Tabular Q-learning or SARSA on a deterministic model, with n_agents
+    independent agents stepping in lockstep as array operations.
+    next_states[s, a] and rewards[s, a] describe the model (e.g. a compiled
+    transition table); the task is continuing, so absorbing states keep
+    bootstrapping. Every agent follows an epsilon-greedy policy (see
+    epsilon_schedule) and restarts from a random start state (all states by
+    default) after episode_length steps; restarts are staggered.
+    Within a step all agents read Q as it was at the start of the step, and
+    agents that hit the same state and action make one update between them:
+    with Q-learning their targets are equal (deterministic transitions), with
+    SARSA each bootstraps from its own next action and the update uses the
+    mean of their targets.
+    Returns (Q, TDStats) after about n_updates updates; Q has shape (n_states, n_actions).
+    """
+    if method not in TD_METHODS:
+        raise ValueError(f"Unknown TD method '{method}', expected one of {TD_METHODS}.")
+    n_states, n_actions = next_states.shape
+    rng = np.random.default_rng(seed)
+    start_states = np.arange(n_states) if start_states is None else np.asarray(start_states)
+    n_steps = max(-(-n_updates // n_agents), 1)
+    epsilons = epsilon_schedule(epsilon, n_steps + 1, decay)
+
+    # Action-major tables, so one take gathers the Q-values of all agents' states per action
+    Q = np.zeros((n_actions, n_states))
+    flat_Q = Q.ravel()
+    flat_next = np.ascontiguousarray(np.asarray(next_states, dtype=np.intp).T).ravel()
+    flat_rewards = np.ascontiguousarray(np.asarray(rewards, dtype=float).T).ravel()
+    stats = TDStats(method, n_agents)
+    dense_counts = flat_Q.size <= 16 * n_agents
+
+    def explore(greedy_actions, eps):
+        # One uniform draw per agent: below eps it also picks the random action
+        if eps <= 0:
+            return greedy_actions
+        u = rng.random(len(greedy_actions))
+        random_actions = np.minimum((u * (n_actions / eps)).astype(np.intp), n_actions - 1)
+        return np.where(u < eps, random_actions, greedy_actions)
+
+    states = rng.choice(start_states, n_agents)
+    age = rng.integers(0, episode_length, n_agents)  # staggered restarts
+    actions = explore(_greedy(Q.take(states, axis=1))[0], epsilons[0])
+    start = time.perf_counter()
+    for step in range(n_steps):
+        index = actions * n_states + states
+        successors = flat_next.take(index)
+        greedy_actions, best = _greedy(Q.take(successors, axis=1))
+        next_actions = explore(greedy_actions, epsilons[step + 1])
+        if method == 'q_learning':
+            bootstrap = best
+        else:
+            bootstrap = flat_Q.take(next_actions * n_states + successors)
+        target = flat_rewards.take(index) + gamma * bootstrap
+        if method == 'sarsa':
+            # Duplicate (s, a) targets differ, so average them rather than let the last write win:
+            # by bincount over the whole table while it is small, else over the unique pairs
+            if dense_counts:
+                sums = np.bincount(index, weights=target, minlength=flat_Q.size)
+                target = sums.take(index) / np.bincount(index, minlength=flat_Q.size).take(index)
+            else:
+                index, inverse, counts = np.unique(index, return_inverse=True, return_counts=True)
+                target = np.bincount(inverse, weights=target, minlength=len(index)) / counts
+        old = flat_Q.take(index)
+        flat_Q[index] = old + alpha * (target - old)
+
+        # Move on, restarting agents whose episode ended
+        age += 1
+        restart = age >= episode_length
+        n_restarts = int(np.count_nonzero(restart))
+        states = successors
+        if n_restarts:
+            fresh = rng.choice(start_states, n_restarts)
+            states[restart] = fresh
+            next_actions[restart] = explore(_greedy(Q.take(fresh, axis=1))[0], epsilons[step + 1])
+            age[restart] = 0
+            stats.episodes += n_restarts
+        actions = next_actions
+    stats.seconds = time.perf_counter() - start
+    stats.steps = n_steps
+    stats.updates = n_steps * n_agents
+    return np.ascontiguousarray(Q.T), stats
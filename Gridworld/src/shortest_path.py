@@ -0,0 +1,51 @@
+import numpy as np
+from src.sweeps import BellmanBackup, SweepStats, backward_bfs
+
+
+def is_unit_cost(grid_world, gamma):
+    """
+    True if value iteration reduces to shortest paths: a deterministic world
+    with gamma = 1, reward +1 for entering a goal and -1 for every other move.
+    """
+    if gamma != 1 or grid_world.is_stochastic():
+        return False
+    table = grid_world.get_transition_table()
+    return np.array_equal(table.rewards, np.where(table.goals[table.next_states], 1.0, -1.0))
+
+
+def shortest_path_values(grid_world, theta=0.01, max_iterations=500):
+    """
+    Value iteration on a unit-cost world (see is_unit_cost) in one multi-source
+    BFS from the goals. A state d moves from a goal is worth 2 - d; Jacobi
+    sweeps from V = 0 reach that after d sweeps, and every unfinished state
+    loses exactly 1 per sweep until then. The result reproduces the values of
+    the sweeps the 'jacobi' engine would have run, including its stopping
+    rule: -T for states farther than T moves (or cut off from every goal)
+    when it stops after T sweeps.
+    Returns (V, SweepStats) with sweeps = that number of equivalent sweeps.
+    """
+    table = grid_world.get_transition_table()
+    backup = BellmanBackup.from_table(table, 1)
+    layers, visited = backward_bfs(backup, np.flatnonzero(table.goals))
+
+    # Every sweep changes some value by exactly 1 until no state is unfinished, then none
+    first_unchanged = len(layers) + 1 if visited.all() else np.inf
+    if theta > 1:
+        stop = 1
+    elif theta > 0:
+        stop = first_unchanged
+    else:
+        stop = np.inf
+    stats = SweepStats('shortest_path')
+    stats.converged = stop <= max_iterations + 1
+    sweeps = int(stop) if stats.converged else max_iterations + 1
+    stats.sweeps = sweeps
+    stats.backups = len(backup)
+    stats.max_diff = 0.0 if sweeps >= first_unchanged else 1.0
+
+    V = np.zeros(table.n_states)
+    distances = np.full(len(backup), np.inf)
+    for d, layer in enumerate(layers, start=1):
+        distances[layer] = d
+    V[backup.states] = np.where(distances <= sweeps, 2 - distances, -sweeps)
+    return V, stats
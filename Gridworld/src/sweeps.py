@@ -0,0 +1,405 @@
+import heapq
+import itertools
+import time
+import numpy as np
+from src.instrumentation import report_sweep
+
+SWEEP_ENGINES = ('jacobi', 'gauss_seidel', 'bfs', 'prioritized')
+
+# 'bfs' merges consecutive BFS layers into blocks of at least this many positions (and at most
+# BFS_MAX_BLOCKS blocks), so thin layers such as those of corridors do not cost one call each
+BFS_MIN_BLOCK = 1024
+BFS_MAX_BLOCKS = 64
+
+
+class SweepStats:
+    """Work done by a sweep engine. For 'prioritized' sweeps counts equivalent full sweeps."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.sweeps = 0
+        self.backups = 0
+        self.converged = False
+        self.max_diff = np.inf
+
+    def __repr__(self):
+        return (f"SweepStats(engine={self.engine!r}, sweeps={self.sweeps}, backups={self.backups}, "
+                f"converged={self.converged})")
+
+
+class BellmanBackup:
+    """
+    Bellman backups V(s) = max_a R(s, a) + gamma * V(s') for a subset of states.
+    next_states and rewards are action-major, shape (n_actions, len(states)),
+    so a single-action table describes the backup of a fixed policy.
+    """
+    def __init__(self, states, next_states, rewards, gamma, width):
+        self.states = states
+        self.next_states = np.ascontiguousarray(next_states)
+        self.rewards = np.ascontiguousarray(rewards)
+        self.gamma = gamma
+        self.width = width
+
+    @classmethod
+    def from_table(cls, table, gamma):
+        """Optimality backup over all actions for the non-wall, non-goal states."""
+        states = table.active
+        return cls(states, table.next_states[states].T, table.rewards[states].T, gamma, table.width)
+
+    @classmethod
+    def for_actions(cls, table, actions, gamma):
+        """Backup of a fixed policy; actions[s] is an action index or -1 to stay put."""
+        states = table.active
+        actions = actions[states]
+        stay = actions < 0
+        columns = np.where(stay, 0, actions)
+        next_states = np.where(stay, states, table.next_states[states, columns])
+        rewards = np.where(stay, np.where(table.goals[states], 1.0, -1.0), table.rewards[states, columns])
+        return cls(states, next_states[np.newaxis], rewards[np.newaxis], gamma, table.width)
+
+    def __len__(self):
+        return len(self.states)
+
+    def subset(self, positions):
+        """Backup of states[positions] only; the other states keep whatever value V holds."""
+        return BellmanBackup(self.states[positions], self.next_states[:, positions], self.rewards[:, positions],
+                             self.gamma, self.width)
+
+    def backup(self, V, block=None):
+        """New values for states[block] (all states by default), reading V as it is now."""
+        if block is None:
+            return np.max(self.rewards + self.gamma * V.take(self.next_states), axis=0)
+        return np.max(self.rewards[:, block] + self.gamma * V.take(self.next_states[:, block]), axis=0)
+
+    def transitions(self):
+        """(source position, target state) pairs of every possible transition."""
+        sources = np.tile(np.arange(len(self.states)), self.next_states.shape[0])
+        return sources, self.next_states.ravel()
+
+    def scalar_backup(self, values):
+        """Per-state backup function over a plain list of values, for state-by-state engines."""
+        successors = self.next_states.T.tolist()
+        rewards = self.rewards.T.tolist()
+        gamma = self.gamma
+
+        def bellman_value(i):
+            return max(r + gamma * values[s] for r, s in zip(rewards[i], successors[i]))
+        return bellman_value
+
+    def predecessors(self):
+        """CSR (indptr, indices) of the positions whose successors include each position."""
+        n_positions = len(self.states)
+        sources, target_states = self.transitions()
+        position = np.full(max(int(self.states.max(initial=-1)), int(target_states.max(initial=-1))) + 1, -1)
+        position[self.states] = np.arange(n_positions)
+
+        targets = position[target_states]
+        keep = (targets >= 0) & (targets != sources)
+        sources, targets = sources[keep], targets[keep]
+
+        order = np.argsort(targets, kind='stable')
+        indptr = np.zeros(n_positions + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n_positions), out=indptr[1:])
+        return indptr, sources[order]
+
+
+class SparseBellmanBackup(BellmanBackup):
+    """
+    Bellman backups V(s) = max_a r(s, a) + gamma * sum_s' P_a(s, s') V(s') with
+    one sparse (len(states), n_states) matrix per action, for stochastic worlds.
+    rewards holds the expected rewards, shape (n_actions, len(states)).
+    """
+    def __init__(self, states, matrices, rewards, gamma, width):
+        self.states = states
+        self.matrices = [matrix.tocsr() for matrix in matrices]
+        self.rewards = np.ascontiguousarray(rewards)
+        self.gamma = gamma
+        self.width = width
+
+    @classmethod
+    def from_world(cls, grid_world, gamma):
+        """Optimality backup over all actions for the non-wall, non-goal states."""
+        states = grid_world.get_transition_table().active
+        matrices = [matrix[states] for matrix in grid_world.get_transition_matrices()]
+        return cls(states, matrices, grid_world.get_expected_rewards()[states].T, gamma, grid_world.get_width())
+
+    @classmethod
+    def for_world_actions(cls, grid_world, actions, gamma):
+        """Backup of a fixed policy; actions[s] is an action index or -1 to stay put."""
+        states = grid_world.get_transition_table().active
+        matrix = grid_world.build_transition_matrix(actions)[states]
+        rewards = matrix @ grid_world.get_state_rewards()
+        return cls(states, [matrix], rewards[np.newaxis], gamma, grid_world.get_width())
+
+    def subset(self, positions):
+        return SparseBellmanBackup(self.states[positions], [matrix[positions] for matrix in self.matrices],
+                                   self.rewards[:, positions], self.gamma, self.width)
+
+    def backup(self, V, block=None):
+        if block is None:
+            matrices, rewards = self.matrices, self.rewards
+        else:
+            matrices, rewards = [matrix[block] for matrix in self.matrices], self.rewards[:, block]
+        new_values = rewards[0] + self.gamma * (matrices[0] @ V)
+        for a in range(1, len(matrices)):
+            np.maximum(new_values, rewards[a] + self.gamma * (matrices[a] @ V), out=new_values)
+        return new_values
+
+    def transitions(self):
+        sources, targets = [], []
+        for matrix in self.matrices:
+            coo = matrix.tocoo()
+            keep = coo.data != 0
+            sources.append(coo.row[keep])
+            targets.append(coo.col[keep])
+        return np.concatenate(sources).astype(np.int64), np.concatenate(targets).astype(np.int64)
+
+    def scalar_backup(self, values):
+        rows = [(matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist()) for matrix in self.matrices]
+        rewards = self.rewards.tolist()
+        gamma = self.gamma
+
+        def bellman_value(i):
+            best = -np.inf
+            for a, (indptr, indices, data) in enumerate(rows):
+                expected = sum(p * values[s] for p, s in zip(data[indptr[i]:indptr[i + 1]],
+                                                            indices[indptr[i]:indptr[i + 1]]))
+                best = max(best, rewards[a][i] + gamma * expected)
+            return best
+        return bellman_value
+
+
+def make_backup(grid_world, gamma, actions=None):
+    """
+    Backup for value iteration (actions=None) or for evaluating the given
+    per-state action indices, using sparse matrices if the world is stochastic.
+    """
+    if grid_world.is_stochastic():
+        if actions is None:
+            return SparseBellmanBackup.from_world(grid_world, gamma)
+        return SparseBellmanBackup.for_world_actions(grid_world, actions, gamma)
+    table = grid_world.get_transition_table()
+    if actions is None:
+        return BellmanBackup.from_table(table, gamma)
+    return BellmanBackup.for_actions(table, actions, gamma)
+
+
+def _gather_rows(indptr, indices, rows):
+    """Concatenation of the CSR rows indices[indptr[r]:indptr[r + 1]] for r in rows."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return indices[offsets]
+
+
+def jacobi(backup, V, theta, max_iterations, callback=None):
+    """Synchronous sweeps: every backup reads the values of the previous sweep."""
+    stats = SweepStats('jacobi')
+    states = backup.states
+    started = time.perf_counter() if callback is not None else None
+    while True:
+        stats.sweeps += 1
+        new_values = backup.backup(V)
+        stats.max_diff = np.max(np.abs(new_values - V[states]), initial=0)
+        V[states] = new_values
+        stats.backups += len(states)
+        if callback is not None:
+            started = report_sweep(callback, stats, len(states), started)
+
+        if stats.max_diff < theta:
+            stats.converged = True
+            return stats
+        if stats.sweeps > max_iterations:
+            return stats
+
+
+def _blocked_sweeps(engine, backup, V, blocks, theta, max_iterations, callback=None):
+    """
+    In-place sweeps over blocks of positions; later blocks read the values
+    written by earlier ones. Each block's part of the backup (including its
+    sparse matrix rows) is sliced once, not on every sweep.
+    """
+    stats = SweepStats(engine)
+    states = backup.states
+    blocks = [backup.subset(block) for block in blocks if len(block)]
+    started = time.perf_counter() if callback is not None else None
+    while True:
+        stats.sweeps += 1
+        stats.max_diff = 0
+        for block in blocks:
+            new_values = block.backup(V)
+            stats.max_diff = max(stats.max_diff, np.max(np.abs(new_values - V[block.states])))
+            V[block.states] = new_values
+            stats.backups += len(block)
+        if callback is not None:
+            started = report_sweep(callback, stats, len(states), started)
+
+        if stats.max_diff < theta:
+            stats.converged = True
+            return stats
+        if stats.sweeps > max_iterations:
+            return stats
+
+
+def gauss_seidel(backup, V, theta, max_iterations, callback=None):
+    """
+    In-place Gauss-Seidel in red-black order. Grid moves always change the
+    checkerboard colour, so updating all red cells and then all black cells
+    equals a pointwise in-place sweep in that order.
+    """
+    rows, cols = np.divmod(backup.states, backup.width)
+    red = (rows + cols) % 2 == 0
+    blocks = [np.flatnonzero(red), np.flatnonzero(~red)]
+    return _blocked_sweeps('gauss_seidel', backup, V, blocks, theta, max_iterations, callback)
+
+
+def backward_bfs(backup, roots):
+    """
+    Positions grouped by backward BFS distance from the root states (e.g. goals),
+    plus a mask of the positions that can reach a root at all.
+    """
+    n_positions = len(backup)
+    indptr, indices = backup.predecessors()
+    visited = np.zeros(n_positions, dtype=bool)
+
+    # First layer: positions with a transition straight into a root
+    sources, targets = backup.transitions()
+    frontier = np.unique(sources[np.isin(targets, roots)])
+    layers = []
+    while len(frontier):
+        visited[frontier] = True
+        layers.append(frontier)
+        frontier = np.unique(_gather_rows(indptr, indices, frontier))
+        frontier = frontier[~visited[frontier]]
+    return layers, visited
+
+
+def bfs_layers(backup, roots):
+    """BFS layers from the roots; positions that cannot reach a root form the last layer."""
+    layers, visited = backward_bfs(backup, roots)
+    unreached = np.flatnonzero(~visited)
+    if len(unreached):
+        layers.append(unreached)
+    return layers
+
+
+def merge_layers(layers, min_size):
+    """Consecutive layers concatenated into blocks of at least min_size positions (the last may be smaller)."""
+    blocks, pending, size = [], [], 0
+    for layer in layers:
+        pending.append(layer)
+        size += len(layer)
+        if size >= min_size:
+            blocks.append(np.concatenate(pending))
+            pending, size = [], 0
+    if pending:
+        blocks.append(np.concatenate(pending))
+    return blocks
+
+
+def bfs_ordered(backup, V, theta, max_iterations, roots, callback=None):
+    """
+    In-place sweeps ordered by backward BFS from the roots, so values flow
+    outwards in one sweep. Thin layers are merged into blocks (see
+    BFS_MIN_BLOCK), which are backed up Jacobi-style within themselves;
+    small maps thus end up as a single Jacobi block.
+    """
+    min_size = max(BFS_MIN_BLOCK, -(-len(backup) // BFS_MAX_BLOCKS))
+    blocks = merge_layers(bfs_layers(backup, roots), min_size)
+    return _blocked_sweeps('bfs', backup, V, blocks, theta, max_iterations, callback)
+
+
+def prioritized(backup, V, theta, max_iterations, roots=(), callback=None):
+    """
+    Prioritized sweeping: repeatedly back up the state with the largest
+    Bellman error and re-queue its predecessors; equal errors are served
+    first in, first out. Stops once every error is below theta or after
+    max_iterations sweeps' worth of backups. The callback hears about every
+    sweep's worth of backups (and the remainder at the end).
+
+    Positions that cannot reach a root never settle with gamma = 1 (their
+    self-loops keep an error of 1) and would use up the whole budget, so
+    they are left out of the queue and swept with 'jacobi' on their own,
+    ending at the values Jacobi sweeps give them.
+    """
+    stats = SweepStats('prioritized')
+    n_positions = len(backup)
+    if n_positions == 0:
+        stats.converged = True
+        stats.max_diff = 0
+        return stats
+
+    _, reachable = backward_bfs(backup, roots)
+    unreachable_stats = None
+    if not reachable.all():
+        # Their successors cannot reach a root either, so the subproblem is closed
+        unreachable_stats = jacobi(backup.subset(np.flatnonzero(~reachable)), V, theta, max_iterations)
+        if not reachable.any():
+            return unreachable_stats
+        backup = backup.subset(np.flatnonzero(reachable))
+    n_queued = len(backup)
+
+    states = backup.states.tolist()
+    indptr, indices = backup.predecessors()
+    indptr, indices = indptr.tolist(), indices.tolist()
+    values = V.tolist()
+    bellman_value = backup.scalar_backup(values)
+
+    errors = np.abs(backup.backup(V) - V[backup.states]).tolist()
+    order = itertools.count()
+    heap = [(-error, next(order), i) for i, error in enumerate(errors) if error >= theta]
+    heapq.heapify(heap)
+    max_backups = (max_iterations + 1) * n_queued
+    started = time.perf_counter() if callback is not None else None
+
+    while heap and stats.backups < max_backups:
+        neg_error, _, i = heapq.heappop(heap)
+        if -neg_error != errors[i]:
+            continue  # stale heap entry
+
+        values[states[i]] = bellman_value(i)
+        errors[i] = 0
+        stats.backups += 1
+
+        # The state itself may still be off if it can stay put, then every predecessor
+        for p in [i] + indices[indptr[i]:indptr[i + 1]]:
+            error = abs(bellman_value(p) - values[states[p]])
+            if error != errors[p]:
+                errors[p] = error
+                if error >= theta:
+                    heapq.heappush(heap, (-error, next(order), p))
+
+        if callback is not None and stats.backups % n_queued == 0:
+            stats.sweeps = stats.backups // n_queued
+            stats.max_diff = max(errors)
+            started = report_sweep(callback, stats, n_queued, started)
+
+    V[backup.states] = np.take(values, backup.states)
+    stats.sweeps = -(-stats.backups // n_queued)
+    stats.max_diff = max(errors)
+    if callback is not None and stats.backups % n_queued:
+        started = report_sweep(callback, stats, stats.backups % n_queued, started)
+    stats.converged = stats.max_diff < theta
+    if unreachable_stats is not None:
+        stats.backups += unreachable_stats.backups
+        stats.sweeps = -(-stats.backups // n_positions)
+        stats.max_diff = max(stats.max_diff, unreachable_stats.max_diff)
+        stats.converged = stats.converged and unreachable_stats.converged
+    return stats
+
+
+def run_sweeps(engine, backup, V, theta, max_iterations, roots=(), callback=None):
+    """
+    Runs the named sweep engine, updating V in place, and returns its
+    SweepStats. The callback gets a 'sweep' record after every sweep
+    (see src.instrumentation).
+    """
+    if engine == 'jacobi':
+        return jacobi(backup, V, theta, max_iterations, callback)
+    elif engine == 'gauss_seidel':
+        return gauss_seidel(backup, V, theta, max_iterations, callback)
+    elif engine == 'bfs':
+        return bfs_ordered(backup, V, theta, max_iterations, roots, callback)
+    elif engine == 'prioritized':
+        return prioritized(backup, V, theta, max_iterations, roots, callback)
+    else:
+        raise ValueError(f"Unknown sweep engine '{engine}', expected one of {SWEEP_ENGINES}.")
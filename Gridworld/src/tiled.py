@@ -0,0 +1,181 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.sweeps import SweepStats, make_backup, run_sweeps
+from src.instrumentation import report_sweep
+
+# Side length of the square tiles the map is split into
+TILE_SIZE = 256
+
+
+class Tile:
+    """
+    A rectangle of the map with a private copy of its values plus a one-cell
+    halo around it. Moves go at most one cell, so the backups of the tile's
+    states only read the window; the halo is refreshed from the shared value
+    array before every sweep (exchange) and the tile's own values are written
+    back after it. All sweep work is NumPy kernels over preallocated
+    buffers, which release the GIL, so tiles can be swept in threads.
+    """
+    def __init__(self, table, rows, cols, gamma):
+        height, width = table.height, table.width
+        top, bottom = max(rows.start - 1, 0), min(rows.stop + 1, height)
+        left, right = max(cols.start - 1, 0), min(cols.stop + 1, width)
+        window_width = right - left
+        window_rows, window_cols = np.arange(top, bottom)[:, np.newaxis], np.arange(left, right)
+        window = (window_rows * width + window_cols).ravel()
+
+        def local(states):
+            state_rows, state_cols = np.divmod(states, width)
+            return (state_rows - top) * window_width + state_cols - left
+
+        inside = ((window_rows >= rows.start) & (window_rows < rows.stop)
+                  & (window_cols >= cols.start) & (window_cols < cols.stop)).ravel()
+        active = ~(table.walls[window] | table.goals[window])
+
+        self.gamma = gamma
+        self.states = window[inside & active]
+        self.local_states = local(self.states)
+        self.next_states = np.ascontiguousarray(local(table.next_states[self.states]).T)
+        self.rewards = np.ascontiguousarray(table.rewards[self.states].T)
+        self.halo = window[~inside]
+        self.local_halo = np.flatnonzero(~inside)
+        self.window = window
+
+        n_positions = len(self.states)
+        self.values = np.empty(len(window))
+        self.halo_values = np.empty(len(self.halo))
+        self.q = np.empty(self.next_states.shape)
+        self.new_values = np.empty(n_positions)
+        self.diff = np.empty(n_positions)
+
+    def __len__(self):
+        return len(self.states)
+
+    def load(self, V):
+        np.take(V, self.window, out=self.values, mode='clip')
+
+    def exchange(self, V):
+        """Refreshes the halo from the shared values."""
+        np.take(V, self.halo, out=self.halo_values, mode='clip')
+        self.values[self.local_halo] = self.halo_values
+
+    def sweep(self):
+        """One Jacobi sweep of the tile's states on its own buffers; returns the max change."""
+        np.take(self.values, self.next_states, out=self.q, mode='clip')
+        self.q *= self.gamma
+        self.q += self.rewards
+        np.max(self.q, axis=0, out=self.new_values)
+        np.take(self.values, self.local_states, out=self.diff, mode='clip')
+        np.subtract(self.new_values, self.diff, out=self.diff)
+        np.abs(self.diff, out=self.diff)
+        self.values[self.local_states] = self.new_values
+        return self.diff.max(initial=0)
+
+    def store(self, V):
+        """Writes the tile's values to the shared array; tiles own disjoint states."""
+        V[self.states] = self.new_values
+
+
+def make_tiles(table, gamma, tile_size=TILE_SIZE):
+    """Tiles of at most tile_size x tile_size cells covering the map, leaving out those without active states."""
+    tiles = []
+    for top in range(0, table.height, tile_size):
+        for left in range(0, table.width, tile_size):
+            tile = Tile(table, slice(top, min(top + tile_size, table.height)),
+                        slice(left, min(left + tile_size, table.width)), gamma)
+            if len(tile):
+                tiles.append(tile)
+    return tiles
+
+
+def solve_tiled(grid_world, gamma=1, theta=0.01, max_iterations=500, workers=None, tile_size=TILE_SIZE,
+                callback=None):
+    """
+    Value iteration over tiles swept in parallel threads. Every sweep first
+    exchanges the halos of all tiles, then each tile sweeps its own copy and
+    stores its values, so the result is exactly that of the 'jacobi' engine,
+    including when it stops. Stochastic gridworlds are solved with plain
+    Jacobi sweeps. Returns (V, SweepStats).
+    """
+    table = grid_world.get_transition_table()
+    V = np.zeros(table.n_states)
+    if grid_world.is_stochastic():
+        stats = run_sweeps('jacobi', make_backup(grid_world, gamma), V, theta, max_iterations, callback=callback)
+        return V, stats
+
+    tiles = make_tiles(table, gamma, tile_size)
+    n_positions = sum(len(tile) for tile in tiles)
+    stats = SweepStats('tiled')
+    if n_positions == 0:
+        stats.converged = True
+        stats.max_diff = 0
+        return V, stats
+
+    started = time.perf_counter() if callback is not None else None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for tile in tiles:
+            tile.load(V)
+        while True:
+            # Exchange all halos before any tile sweeps, so a sweep does not depend on thread timing
+            list(pool.map(lambda tile: tile.exchange(V), tiles))
+            diffs = list(pool.map(lambda tile: _sweep_and_store(tile, V), tiles))
+
+            stats.sweeps += 1
+            stats.backups += n_positions
+            stats.max_diff = max(diffs)
+            if callback is not None:
+                started = report_sweep(callback, stats, n_positions, started)
+
+            if stats.max_diff < theta:
+                stats.converged = True
+                return V, stats
+            if stats.sweeps > max_iterations:
+                return V, stats
+
+
+def _sweep_and_store(tile, V):
+    diff = tile.sweep()
+    tile.store(V)
+    return diff
+
+
+def benchmark_workers(grid_world, worker_counts, gamma=1, theta=0.01, max_iterations=500, tile_size=TILE_SIZE):
+    """Solves the same map with each number of worker threads; returns and prints time and speedup per count."""
+    results = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        _, stats = solve_tiled(grid_world, gamma, theta, max_iterations, workers, tile_size)
+        elapsed = time.perf_counter() - start
+        speedup = results[0]['seconds'] / elapsed if results else 1.0
+        results.append({'workers': workers, 'seconds': elapsed, 'speedup': speedup, 'sweeps': stats.sweeps,
+                        'converged': stats.converged})
+        print(f"{workers:3d} workers: {elapsed:.3f}s, speedup {speedup:.2f}x "
+              f"({stats.sweeps} sweeps{'' if stats.converged else ', not converged'})")
+    return results
+
+
+def main(argv=None):
+    from src.map_parser import MapParser
+    from src.gridworld import GridWorld
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the tiled multi-threaded Gridworld solver.")
+    parser.add_argument('map', help=".grid file to solve")
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help="worker thread counts to compare (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument('--gamma', type=float, default=1)
+    parser.add_argument('--theta', type=float, default=0.01)
+    parser.add_argument('--max-iterations', type=int, default=500)
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    args = parser.parse_args(argv)
+
+    worker_counts = args.workers
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = [1 << i for i in range(cpus.bit_length()) if 1 << i < cpus] + [cpus]
+    grid_world = GridWorld(MapParser().parse_map(args.map))
+    benchmark_workers(grid_world, worker_counts, args.gamma, args.theta, args.max_iterations, args.tile_size)
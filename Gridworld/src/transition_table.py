@@ -0,0 +1,128 @@
+from enum import IntEnum
+import numpy as np
+
+# Action order shared by all solvers: column a of a transition table is ACTIONS[a]
+ACTIONS = ['GO_NORTH', 'GO_EAST', 'GO_SOUTH', 'GO_WEST']
+ACTION_DELTAS = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+
+
+class Action(IntEnum):
+    """Action codes stored in policies (int8); NONE (walls, goals) keeps the agent in place."""
+    NONE = -1
+    GO_NORTH = 0
+    GO_EAST = 1
+    GO_SOUTH = 2
+    GO_WEST = 3
+
+
+# Action names by code, the last entry doubles as code -1 ('NONE')
+ACTION_NAMES = np.array(ACTIONS + ['NONE'], dtype=object)
+
+
+def action_code(action):
+    """Action code of an action name or code; unknown names (e.g. 'NONE', 'X') are Action.NONE."""
+    if isinstance(action, str):
+        return Action[action] if action in ACTIONS else Action.NONE
+    return Action(action)
+
+
+def as_action_array(actions):
+    """int8 action codes from an array of codes or a sequence of action names."""
+    if isinstance(actions, np.ndarray) and actions.dtype.kind in 'iu':
+        return actions.astype(np.int8, copy=False)
+    names = np.asarray(actions, dtype=object)
+    codes = np.full(names.shape, Action.NONE, dtype=np.int8)
+    for a, action in enumerate(ACTIONS):
+        codes[names == action] = a
+    return codes
+
+
+def action_names(codes):
+    """Action names of an array of action codes, for output."""
+    return ACTION_NAMES[codes].tolist()
+
+
+class TransitionTable:
+    """
+    Compiled deterministic transition model of a gridworld.
+    next_states[s, a] is the index of the cell reached from s with ACTIONS[a]
+    and rewards[s, a] is R(s, s', a) for that move, following the same rules
+    as GridWorld.propose_move and GridWorld.get_reward.
+    """
+    def __init__(self, next_states, rewards, walls, goals, width, height):
+        self.next_states = next_states  # int array, shape (n_states, n_actions)
+        self.rewards = rewards  # float array, shape (n_states, n_actions)
+        self.walls = walls  # bool array, shape (n_states,)
+        self.goals = goals  # bool array, shape (n_states,)
+        self.width = width
+        self.height = height
+        # States whose value is updated by the Bellman backup
+        self.active = np.flatnonzero(~(walls | goals))
+
+    @classmethod
+    def from_map(cls, grid_map):
+        return cls.from_cell_types(grid_map.wall_mask(), grid_map.goal_mask())
+
+    @classmethod
+    def from_cell_types(cls, walls, goals):
+        """Builds the table from 2D boolean wall and goal masks."""
+        height, width = walls.shape
+        rows, cols = np.divmod(np.arange(height * width), width)
+        next_states = cls._compute_next_states(walls, goals, rows, cols)
+        goals = goals.ravel()
+        rewards = np.where(goals[next_states], 1.0, -1.0)
+        return cls(next_states, rewards, walls.ravel(), goals, width, height)
+
+    @staticmethod
+    def _compute_next_states(walls, goals, rows, cols):
+        """Next state of every action for the cells at (rows, cols), shape (len(rows), n_actions)."""
+        height, width = walls.shape
+        index = rows * width + cols
+        next_states = np.empty((len(rows), len(ACTIONS)), dtype=np.int64)
+        for a, (d_row, d_col) in enumerate(ACTION_DELTAS):
+            new_rows, new_cols = rows + d_row, cols + d_col
+            inside = (new_rows >= 0) & (new_rows < height) & (new_cols >= 0) & (new_cols < width)
+            new_rows = np.clip(new_rows, 0, height - 1)
+            new_cols = np.clip(new_cols, 0, width - 1)
+            # Moves leaving the map or into a wall keep the agent in place, the goal is absorbing
+            blocked = ~inside | walls[new_rows, new_cols] | goals[rows, cols]
+            next_states[:, a] = np.where(blocked, index, new_rows * width + new_cols)
+        return next_states
+
+    def update_cells(self, walls, goals, states):
+        """
+        Recomputes the rows of the given states after the 2D wall/goal masks
+        changed. states must include the changed cells and their neighbours.
+        """
+        states = np.asarray(states, dtype=np.int64)
+        rows, cols = np.divmod(states, self.width)
+        self.walls[states] = walls[rows, cols]
+        self.goals[states] = goals[rows, cols]
+        next_states = self._compute_next_states(walls, goals, rows, cols)
+        self.next_states[states] = next_states
+        self.rewards[states] = np.where(self.goals[next_states], 1.0, -1.0)
+        self.active = np.flatnonzero(~(self.walls | self.goals))
+
+    def neighbours(self, state):
+        """States one move away from state, within the map."""
+        row, col = divmod(state, self.width)
+        return [(row + d_row) * self.width + col + d_col for d_row, d_col in ACTION_DELTAS
+                if 0 <= row + d_row < self.height and 0 <= col + d_col < self.width]
+
+    @property
+    def n_states(self):
+        return self.next_states.shape[0]
+
+    @property
+    def n_actions(self):
+        return self.next_states.shape[1]
+
+    def q_values(self, V, gamma, states=None):
+        """Q(s, a) = R(s, s', a) + gamma * V(s') for the given states (all by default)."""
+        if states is None:
+            return self.rewards + gamma * V[self.next_states]
+        return self.rewards[states] + gamma * V[self.next_states[states]]
+
+    def greedy_actions(self, V, gamma):
+        """Index of the first maximizing action for every state."""
+        return np.argmax(self.q_values(V, gamma), axis=1)
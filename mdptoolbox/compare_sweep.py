@@ -0,0 +1,194 @@
+"""
+无界面批量比较：地图 × 折扣 × epsilon × 算法的所有组合在进程池上求解，
+记录迭代次数、耗时、价值以及与精确解的策略一致率，最后输出一份汇总报告。
+
+epsilon对价值迭代是收敛阈值，对Q学习是线性衰减探索率的终值（从1.0开始）；
+策略迭代不使用epsilon，每个地图和折扣只运行一次。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # 进程池中不弹出图窗
+
+import numpy as np
+from gridworld_mdptoolbox import GridWorldMDPToolbox, create_complex_gridworld
+
+SWEEP_ALGORITHMS = ('value_iteration', 'policy_iteration', 'q_learning')
+EPSILON_ALGORITHMS = ('value_iteration', 'q_learning')
+# 内置地图名；其它名字按.grid文件路径加载
+BUILTIN_MAPS = ('default', 'complex')
+# 动作的Q值与最优值相差不超过该值即视为最优动作（允许并列最优）
+OPTIMAL_TOLERANCE = 1e-6
+
+_models = {}
+
+
+def load_model(map_name):
+    """按地图名创建GridWorldMDPToolbox，每个进程内缓存"""
+    if map_name not in _models:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if map_name == 'default':
+                _models[map_name] = GridWorldMDPToolbox()
+            elif map_name == 'complex':
+                _models[map_name] = create_complex_gridworld()
+            else:
+                _models[map_name] = GridWorldMDPToolbox(map_name)
+    return _models[map_name]
+
+
+def sweep_configs(maps, discounts, epsilons, algorithms=SWEEP_ALGORITHMS):
+    """所有(地图, 折扣, epsilon, 算法)组合；不使用epsilon的算法epsilon为None"""
+    for algorithm in algorithms:
+        if algorithm not in SWEEP_ALGORITHMS:
+            raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {SWEEP_ALGORITHMS}.")
+    configs = []
+    for map_name in maps:
+        for discount in discounts:
+            for algorithm in algorithms:
+                for epsilon in (epsilons if algorithm in EPSILON_ALGORITHMS else [None]):
+                    configs.append((map_name, discount, epsilon, algorithm))
+    return configs
+
+
+def _solve_exact(map_name, discount):
+    """进程池任务：精确解（策略迭代，策略评估为线性方程组求解）的价值函数"""
+    model = load_model(map_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        values, _ = model.solve_policy_iteration(discount)
+    return np.asarray(values, dtype=float)
+
+
+def _solve_config(map_name, discount, epsilon, algorithm, exact_values, q_updates):
+    """
+    进程池任务：求解一个组合，返回记录。策略一致率是非墙非目标状态中
+    所选动作在精确解下最优的比例，价值误差是这些状态上与精确解的最大差
+    """
+    model = load_model(map_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if algorithm == 'value_iteration':
+            values, policy = model.solve_value_iteration(discount, epsilon)
+        elif algorithm == 'policy_iteration':
+            values, policy = model.solve_policy_iteration(discount)
+        else:
+            values, policy = model.solve_q_learning(discount, n_iter=q_updates, epsilon=(1.0, epsilon))
+        seconds = time.perf_counter() - start
+
+    values, policy = np.asarray(values, dtype=float), np.asarray(policy)
+    table = model.transition_table
+    free = ~(table.walls | table.goals)[model.state_cells]
+    states = np.flatnonzero(free)
+    exact_q = model.R[states] + discount * exact_values[model._next_states()[states]]
+    chosen = exact_q[np.arange(len(states)), policy[states]]
+    optimal = chosen >= exact_q.max(axis=1) - OPTIMAL_TOLERANCE
+    return {
+        'map': map_name,
+        'discount': discount,
+        'epsilon': epsilon,
+        'algorithm': algorithm,
+        'iterations': int(model.iterations),
+        'seconds': seconds,
+        'max_value': float(values[states].max(initial=0)),
+        'value_error': float(np.abs(values - exact_values)[states].max(initial=0)),
+        'policy_agreement': float(optimal.mean()) if len(states) else 1.0,
+        'values': values.tolist(),
+    }
+
+
+def run_sweep(maps, discounts, epsilons, algorithms=SWEEP_ALGORITHMS, workers=None, q_updates=10**7):
+    """
+    在进程池上先求每个(地图, 折扣)的精确解，再求解所有组合。
+    返回按组合顺序排列的记录，失败的组合记录error
+    """
+    configs = sweep_configs(maps, discounts, epsilons, algorithms)
+    records = [None] * len(configs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        exact_futures = {pool.submit(_solve_exact, map_name, discount): (map_name, discount)
+                         for map_name in maps for discount in discounts}
+        exact = {}
+        for future in as_completed(exact_futures):
+            try:
+                exact[exact_futures[future]] = future.result()
+            except Exception as e:
+                exact[exact_futures[future]] = e
+
+        futures = {}
+        for i, (map_name, discount, epsilon, algorithm) in enumerate(configs):
+            exact_values = exact[(map_name, discount)]
+            if isinstance(exact_values, Exception):
+                records[i] = _failed(configs[i], exact_values)
+            else:
+                futures[pool.submit(_solve_config, map_name, discount, epsilon, algorithm, exact_values,
+                                    q_updates)] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                records[i] = future.result()
+            except Exception as e:
+                records[i] = _failed(configs[i], e)
+    return records
+
+
+def _failed(config, error):
+    map_name, discount, epsilon, algorithm = config
+    return {'map': map_name, 'discount': discount, 'epsilon': epsilon, 'algorithm': algorithm,
+            'error': str(error)}
+
+
+def format_report(records):
+    """汇总报告：每个组合一行，最后按算法汇总"""
+    lines = [f"{'map':<24} {'discount':>8} {'epsilon':>8} {'algorithm':<16} {'iterations':>10} "
+             f"{'time':>9} {'max value':>10} {'error':>9} {'agreement':>9}"]
+    for r in records:
+        epsilon = '-' if r['epsilon'] is None else f"{r['epsilon']:g}"
+        head = f"{os.path.basename(r['map']):<24} {r['discount']:>8g} {epsilon:>8} {r['algorithm']:<16}"
+        if 'error' in r:
+            lines.append(f"{head} failed: {r['error']}")
+        else:
+            lines.append(f"{head} {r['iterations']:>10} {r['seconds']:>8.3f}s {r['max_value']:>10.3f} "
+                         f"{r['value_error']:>9.2e} {r['policy_agreement']:>9.1%}")
+
+    lines.append("")
+    for algorithm in SWEEP_ALGORITHMS:
+        done = [r for r in records if r['algorithm'] == algorithm and 'error' not in r]
+        if not done:
+            continue
+        lines.append(f"{algorithm:<16} {len(done):>3} runs, total {sum(r['seconds'] for r in done):.2f}s, "
+                     f"max error {max(r['value_error'] for r in done):.2e}, "
+                     f"min agreement {min(r['policy_agreement'] for r in done):.1%}")
+    failed = sum('error' in r for r in records)
+    if failed:
+        lines.append(f"{failed} runs failed")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面批量比较价值迭代、策略迭代和Q学习")
+    parser.add_argument('--maps', nargs='+', default=list(BUILTIN_MAPS),
+                        help="内置地图名(default, complex)或.grid文件路径")
+    parser.add_argument('--discounts', nargs='+', type=float, default=[0.9])
+    parser.add_argument('--epsilons', nargs='+', type=float, default=[0.01])
+    parser.add_argument('--algorithms', nargs='+', choices=SWEEP_ALGORITHMS, default=list(SWEEP_ALGORITHMS))
+    parser.add_argument('--workers', type=int, default=None, help="进程数（默认CPU核数）")
+    parser.add_argument('--q-updates', type=float, default=1e7, help="Q学习的更新次数")
+    parser.add_argument('--out', metavar='FILE', help="把全部记录（含价值函数）写成JSON")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = run_sweep(args.maps, args.discounts, args.epsilons, args.algorithms, args.workers,
+                        int(args.q_updates))
+    print(format_report(records))
+    print(f"\n{len(records)} runs in {time.perf_counter() - start:.2f}s")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(records, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
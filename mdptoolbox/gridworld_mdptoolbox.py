@@ -1,10 +1,21 @@
+import os
+import sys
 import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+import scipy.sparse.csgraph
 import mdptoolbox
 import mdptoolbox.mdp
 import matplotlib.pyplot as plt
 import matplotlib
 import platform
 
+# 与Gridworld/src共用地图解析和转移表
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Gridworld'))
+from src.map_parser import Map
+from src.transition_table import ACTIONS, TransitionTable
+from src.q_learning import learn_q
+
 # 配置中文字体
 system = platform.system()
 if system == 'Windows':
@@ -15,32 +26,16 @@ elif system == 'Linux':
     matplotlib.rc('font', family='WenQuanYi Micro Hei')
 matplotlib.rcParams['axes.unicode_minus'] = False
 
-class Cell:
-    def __init__(self, row, col, cell_type, index):
-        self.row = row
-        self.col = col
-        self.cell_type = cell_type
-        self.index = index
-
-    def is_wall(self):
-        return self.cell_type == '#'
-
-    def is_goal(self):
-        return self.cell_type == 'X'
-
-    def is_empty(self):
-        return self.cell_type == ' '
-
-    def get_coords(self):
-        return (self.row, self.col)
-
-    def get_index(self):
-        return self.index
-
 class GridWorldMDPToolbox:
-    def __init__(self, grid_map_path=None, grid_string=None):
-        """初始化GridWorld MDP环境"""
-        # 加载地图
+    def __init__(self, grid_map_path=None, grid_string=None, sparse=True, compact=False):
+        """
+        初始化GridWorld MDP环境；sparse=False时P为稠密数组 (n_actions, n_states, n_states)。
+        compact=True时状态只包含能到达目标的非墙格子（墙壁和封闭区域对其它状态的
+        价值没有影响），P为稀疏矩阵，
+        价值迭代和策略迭代直接在稀疏矩阵上求解，可用于上百万格子的地图；
+        结果按紧凑编号，用to_grid映射回网格坐标
+        """
+        # 加载地图（Gridworld/src的Map：uint8格子类型数组）
         if grid_map_path:
             self.grid_map = self._parse_map_file(grid_map_path)
         elif grid_string:
@@ -49,16 +44,32 @@ class GridWorldMDPToolbox:
             # 使用默认地图
             self.grid_map = self._create_default_map()
         
-        # 定义动作
-        self.actions = ['GO_NORTH', 'GO_EAST', 'GO_SOUTH', 'GO_WEST']
+        # 定义动作（与Gridworld/src相同的顺序）
+        self.actions = list(ACTIONS)
         self.num_actions = len(self.actions)
-        self.num_states = len(self.grid_map['cells'])
+        self.transition_table = TransitionTable.from_map(self.grid_map)
+        self.compact = compact
+        self.sparse = sparse or compact
+        
+        # 状态编号：state_cells[状态] = 网格下标，state_index[网格下标] = 状态（墙壁为-1）
+        n_cells = self.grid_map.get_width() * self.grid_map.get_height()
+        if compact:
+            self.state_cells = self._goal_reaching_cells()
+            if len(self.state_cells) == 0:
+                raise ValueError("Compact state space is empty: the map has no goal.")
+        else:
+            self.state_cells = np.arange(n_cells)
+        self.state_index = np.full(n_cells, -1, dtype=np.intp)
+        self.state_index[self.state_cells] = np.arange(len(self.state_cells))
+        self.num_states = len(self.state_cells)
+        self.iterations = None  # 最近一次求解的迭代次数（Q学习为更新次数）
+        self._stacked_P = None
         
         # 构建转移概率矩阵和奖励矩阵
-        self.P, self.R = self._build_mdp_matrices()
+        self.P, self.R = self._build_mdp_matrices(self.sparse)
     
     def _parse_map_file(self, file_path):
-        """解析地图文件"""
+        """解析地图文件（跳过空行，只去掉行尾空白）"""
         try:
             with open(file_path, 'r') as f:
                 lines = [line.rstrip() for line in f if line.strip()]
@@ -69,27 +80,20 @@ class GridWorldMDPToolbox:
         return self._parse_map_lines(lines)
     
     def _parse_map_string(self, grid_string):
-        """解析地图字符串"""
-        lines = grid_string.strip().split('\n')
-        return self._parse_map_lines(lines)
+        """解析地图字符串（只去掉整个字符串首尾的空白，行首空格保留为空格子）"""
+        return self._parse_map_lines(grid_string.strip().split('\n'))
     
     def _parse_map_lines(self, lines):
-        """解析地图行"""
-        height = len(lines)
+        """
+        把地图行转成Gridworld/src的Map（uint8格子类型数组）。
+        与Gridworld的MapParser不同，行首空格不去掉，列位置保持不变
+        """
         width = len(lines[0]) if lines else 0
-        cells = []
-        index = 0
-        
         for r, line in enumerate(lines):
-            for c, char in enumerate(line):
-                cells.append(Cell(r, c, char, index))
-                index += 1
-        
-        return {
-            'cells': cells,
-            'width': width,
-            'height': height
-        }
+            if len(line) != width:
+                raise ValueError(f"Map rows must have consistent width (row {r} has {len(line)}, expected {width}).")
+        cell_types = np.frombuffer(''.join(lines).encode('ascii'), dtype=np.uint8)
+        return Map(cell_types.reshape(len(lines), width).copy())
     
     def _create_default_map(self):
         """创建默认的简单地图"""
@@ -102,100 +106,174 @@ class GridWorldMDPToolbox:
     
     def get_cell_by_coords(self, row, col):
         """根据坐标获取格子"""
-        if 0 <= row < self.grid_map['height'] and 0 <= col < self.grid_map['width']:
-            return self.grid_map['cells'][row * self.grid_map['width'] + col]
-        return None
+        return self.grid_map.get_cell_by_coords(row, col)
+    
+    def _goal_reaching_cells(self):
+        """
+        能到达目标的格子（含目标）的网格下标：在反向的移动图上，从连向所有
+        目标的虚拟节点做广度优先搜索（scipy.sparse.csgraph，不逐层循环）
+        """
+        table = self.transition_table
+        n_cells = len(table.walls)
+        free = np.flatnonzero(~table.walls)
+        goals = np.flatnonzero(table.goals)
+        # 反向边：下一个状态 -> 当前状态；虚拟节点n_cells -> 每个目标
+        rows = np.concatenate([table.next_states[free].ravel(), np.full(len(goals), n_cells)])
+        cols = np.concatenate([np.repeat(free, self.num_actions), goals])
+        graph = scipy.sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                                        shape=(n_cells + 1, n_cells + 1))
+        order = scipy.sparse.csgraph.breadth_first_order(graph, n_cells, directed=True, return_predecessors=False)
+        return np.sort(order[order < n_cells])
+    
+    def _next_states(self):
+        """每个状态执行各动作后的下一个状态 (n_states, n_actions)；墙壁状态留在原地"""
+        table = self.transition_table
+        if self.compact:
+            return self.state_index[table.next_states[self.state_cells]]
+        return np.where(table.walls[:, np.newaxis], np.arange(self.num_states)[:, np.newaxis], table.next_states)
+    
+    def to_grid(self, values, policy):
+        """把按状态编号的价值和策略映射回整个网格（按网格下标）；紧凑模式下不是状态的格子为nan和-1"""
+        if not self.compact:
+            return np.asarray(values), np.asarray(policy)
+        n_cells = len(self.state_index)
+        grid_values = np.full(n_cells, np.nan)
+        grid_policy = np.full(n_cells, -1, dtype=np.intp)
+        grid_values[self.state_cells] = values
+        grid_policy[self.state_cells] = policy
+        return grid_values, grid_policy
     
     def propose_move(self, current_cell, action):
         """模拟动作效果"""
-        if current_cell.is_goal():
+        if action not in self.actions:
             return current_cell
+        index = current_cell.get_index()
+        next_index = self.transition_table.next_states[index, self.actions.index(action)]
+        row, col = divmod(int(next_index), self.grid_map.get_width())
+        return self.get_cell_by_coords(row, col)
+    
+    def _build_mdp_matrices(self, sparse=True):
+        """
+        构建MDP的转移矩阵P和奖励矩阵R (n_states, n_actions)，全部是数组运算：
+        下一个状态来自转移表（按动作平移、边界截断、墙壁和目标掩码），
+        留在原地和到达目标同样用布尔掩码判断。
+        sparse=True时P是每个动作一个scipy.sparse CSR矩阵（每行一个非零元），
+        否则是稠密数组 (n_actions, n_states, n_states)
+        """
+        n = self.num_states
+        table = self.transition_table
+        next_states = self._next_states()
+        states = np.arange(n)
+        goals = table.goals[self.state_cells]
         
-        new_row, new_col = current_cell.row, current_cell.col
-        
-        if action == 'GO_NORTH':
-            new_row -= 1
-        elif action == 'GO_EAST':
-            new_col += 1
-        elif action == 'GO_SOUTH':
-            new_row += 1
-        elif action == 'GO_WEST':
-            new_col -= 1
-        else:
-            return current_cell
-        
-        proposed_cell = self.get_cell_by_coords(new_row, new_col)
-        
-        if proposed_cell is None or proposed_cell.is_wall():
-            return current_cell
+        # 确定性环境：P[a][s, next_states[s, a]] = 1
+        if sparse:
+            P = [scipy.sparse.csr_matrix((np.ones(n), (states, next_states[:, a])), shape=(n, n))
+                 for a in range(self.num_actions)]
         else:
-            return proposed_cell
-    
-    def _build_mdp_matrices(self):
-        """构建MDP的转移概率矩阵P和奖励矩阵R"""
-        P = np.zeros((self.num_actions, self.num_states, self.num_states))
-        R = np.zeros((self.num_states, self.num_actions))
+            P = np.zeros((self.num_actions, n, n))
+            P[np.arange(self.num_actions)[:, np.newaxis], states, next_states.T] = 1.0
         
-        cells = self.grid_map['cells']
-        
-        for action_idx, action in enumerate(self.actions):
-            for state_idx, cell in enumerate(cells):
-                if cell.is_wall():
-                    # 墙壁状态：无法执行动作，留在原地
-                    P[action_idx, state_idx, state_idx] = 1.0
-                    R[state_idx, action_idx] = -10  # 墙壁惩罚
-                    continue
-                
-                # 获取执行动作后的下一个状态
-                next_cell = self.propose_move(cell, action)
-                next_state_idx = next_cell.get_index()
-                
-                # 设置转移概率（确定性环境）
-                P[action_idx, state_idx, next_state_idx] = 1.0
-                
-                # 设置奖励
-                if next_cell.is_goal():
-                    R[state_idx, action_idx] = 10  # 到达目标的奖励
-                elif next_cell == cell:  # 撞墙或无效移动
-                    R[state_idx, action_idx] = -1  # 轻微惩罚
-                else:
-                    R[state_idx, action_idx] = -0.1  # 移动成本
+        # 奖励：墙壁-10，到达目标10，撞墙或无效移动-1，移动成本-0.1
+        R = np.where(goals[next_states], 10.0,
+                     np.where(next_states == states[:, np.newaxis], -1.0, -0.1))
+        R[table.walls[self.state_cells]] = -10
         
         return P, R
     
     def solve_value_iteration(self, discount=0.9, epsilon=0.01):
-        """使用mdptoolbox的价值迭代算法"""
+        """使用mdptoolbox的价值迭代算法（紧凑模式下为稀疏矩阵实现）"""
         print("开始价值迭代...")
-        vi = mdptoolbox.mdp.ValueIteration(self.P, self.R, discount=discount, epsilon=epsilon)
-        vi.run()
+        if self.compact:
+            V, policy, self.iterations = self._sparse_value_iteration(discount, epsilon)
+        else:
+            vi = mdptoolbox.mdp.ValueIteration(self.P, self.R, discount=discount, epsilon=epsilon)
+            vi.run()
+            V, policy, self.iterations = vi.V, vi.policy, vi.iter
         
-        print(f"价值迭代收敛，迭代次数: {vi.iter}")
-        return vi.V, vi.policy
+        print(f"价值迭代收敛，迭代次数: {self.iterations}")
+        return V, policy
     
     def solve_policy_iteration(self, discount=0.9):
-        """使用mdptoolbox的策略迭代算法"""
+        """使用mdptoolbox的策略迭代算法（紧凑模式下为稀疏矩阵实现）"""
         print("开始策略迭代...")
-        pi = mdptoolbox.mdp.PolicyIteration(self.P, self.R, discount=discount)
-        pi.run()
+        if self.compact:
+            V, policy, self.iterations = self._sparse_policy_iteration(discount)
+        else:
+            pi = mdptoolbox.mdp.PolicyIteration(self.P, self.R, discount=discount)
+            pi.run()
+            V, policy, self.iterations = pi.V, pi.policy, pi.iter
         
-        print(f"策略迭代收敛，迭代次数: {pi.iter}")
-        return pi.V, pi.policy
+        print(f"策略迭代收敛，迭代次数: {self.iterations}")
+        return V, policy
     
-    def solve_q_learning(self, discount=0.9, n_iter=10000):
-        """使用mdptoolbox的Q学习算法"""
+    def _q_values(self, V, discount):
+        """Q = R + discount * P[a] V，所有动作的P纵向拼接后一次稀疏矩阵乘法"""
+        if self._stacked_P is None:
+            self._stacked_P = scipy.sparse.vstack(self.P, format='csr')
+        return self.R + discount * (self._stacked_P @ V).reshape(self.num_actions, self.num_states).T
+    
+    def _sparse_value_iteration(self, discount, epsilon, max_iter=10**6):
+        """
+        稀疏P上的价值迭代，停止条件与mdptoolbox.mdp.ValueIteration相同：
+        价值变化的跨度小于epsilon * (1 - discount) / discount。
+        （mdptoolbox对稀疏P的检查和迭代上界估计会生成n x n的矩阵）
+        """
+        threshold = epsilon * (1 - discount) / discount if discount < 1 else epsilon
+        V = np.zeros(self.num_states)
+        for iteration in range(1, max_iter + 1):
+            Q = self._q_values(V, discount)
+            new_V = Q.max(axis=1)
+            variation = new_V - V
+            V = new_V
+            if variation.max(initial=0) - variation.min(initial=0) < threshold:
+                break
+        return V, Q.argmax(axis=1), iteration
+    
+    def _sparse_policy_iteration(self, discount, max_iter=1000):
+        """
+        稀疏P上的策略迭代：策略评估用稀疏LU求解 (I - discount * P_pi) V = R_pi，
+        初始策略与mdptoolbox相同（对V=0贪心）；没有动作能严格改进时停止
+        """
+        n = self.num_states
+        states = np.arange(n)
+        identity = scipy.sparse.identity(n, format='csr')
+        policy = self.R.argmax(axis=1)
+        for iteration in range(1, max_iter + 1):
+            P_policy = sum(scipy.sparse.diags((policy == a).astype(float)) @ P_a for a, P_a in enumerate(self.P))
+            V = scipy.sparse.linalg.spsolve((identity - discount * P_policy).tocsc(), self.R[states, policy])
+            
+            # 只在严格更好时换动作，否则并列最优的动作会因舍入误差来回切换
+            Q = self._q_values(V, discount)
+            best = Q.argmax(axis=1)
+            improved = Q[states, best] > Q[states, policy] + 1e-10 * np.maximum(np.abs(V), 1)
+            if not improved.any():
+                break
+            policy = np.where(improved, best, policy)
+        return V, policy, iteration
+    
+    def solve_q_learning(self, discount=0.9, n_iter=10**7, n_agents=4096, alpha=1.0, epsilon=(1.0, 0.05),
+                         method='q_learning'):
+        """
+        表格型Q学习（method='sarsa'时为SARSA）：n_agents个智能体在编译好的
+        下一状态表上同步执行数组运算（见Gridworld/src/q_learning.py），
+        共约n_iter次更新；epsilon为常数或线性衰减的(起始, 结束)
+        """
         print("开始Q学习...")
-        ql = mdptoolbox.mdp.QLearning(self.P, self.R, discount=discount, n_iter=n_iter)
-        ql.run()
+        Q, stats = learn_q(self._next_states(), self.R, discount, n_iter, n_agents=n_agents, alpha=alpha,
+                           epsilon=epsilon, method=method)
+        self.iterations = stats.updates
         
-        print(f"Q学习完成，迭代次数: {n_iter}")
-        return ql.V, ql.policy
+        print(f"Q学习完成，更新次数: {stats.updates}，每秒更新: {stats.updates_per_second:.3g}")
+        return Q.max(axis=1), Q.argmax(axis=1)
     
     def visualize_results(self, values, policy, title="MDP求解结果"):
         """可视化价值函数和策略"""
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
         
         # 将一维数组重塑为2D网格
-        height, width = self.grid_map['height'], self.grid_map['width']
+        values, policy = self.to_grid(values, policy)
+        height, width = self.grid_map.get_height(), self.grid_map.get_width()
         value_grid = np.reshape(values, (height, width))
         policy_grid = np.reshape(policy, (height, width))
         
@@ -213,6 +291,9 @@ class GridWorldMDPToolbox:
                 elif cell.is_goal():
                     text = "G"
                     color = "red"
+                elif np.isnan(values[cell.get_index()]):
+                    text = ""  # 紧凑模式下到达不了目标的格子
+                    color = "white"
                 else:
                     text = f"{values[cell.get_index()]:.1f}"
                     color = "white"
@@ -239,7 +320,7 @@ class GridWorldMDPToolbox:
                     color = "red"
                 else:
                     action_idx = policy[cell.get_index()]
-                    text = action_chars[action_idx]
+                    text = action_chars[action_idx] if action_idx >= 0 else ""
                     color = "blue"
                 
                 ax2.text(j, i, text, ha="center", va="center", 
@@ -254,23 +335,26 @@ class GridWorldMDPToolbox:
         plt.tight_layout()
         plt.show()
     
-    def compare_algorithms(self, discount=0.9):
-        """比较不同算法的结果"""
+    def compare_algorithms(self, discount=0.9, show=True):
+        """比较不同算法的结果；show=False时不画图（批量比较见compare_sweep.py）"""
         print("=" * 50)
         print("使用MDPToolbox比较不同强化学习算法")
         print("=" * 50)
         
         # 价值迭代
         vi_values, vi_policy = self.solve_value_iteration(discount)
-        self.visualize_results(vi_values, vi_policy, "价值迭代")
+        if show:
+            self.visualize_results(vi_values, vi_policy, "价值迭代")
         
         # 策略迭代  
         pi_values, pi_policy = self.solve_policy_iteration(discount)
-        self.visualize_results(pi_values, pi_policy, "策略迭代")
+        if show:
+            self.visualize_results(pi_values, pi_policy, "策略迭代")
         
         # Q学习
-        ql_values, ql_policy = self.solve_q_learning(discount, n_iter=1000)
-        self.visualize_results(ql_values, ql_policy, "Q学习")
+        ql_values, ql_policy = self.solve_q_learning(discount)
+        if show:
+            self.visualize_results(ql_values, ql_policy, "Q学习")
         
         # 比较结果
         print("\n算法比较:")